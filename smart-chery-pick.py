@@ -6,12 +6,38 @@ import json
 import csv
 import atexit
 import re
+import shlex
 import argparse
 import time
 import datetime
-import hashlib
+import threading
+import functools
+import logging
+import concurrent.futures
+import collections
+import heapq
+import itertools
 from colorama import init, Fore, Style
-from collections import OrderedDict
+
+# rapidfuzz es opcional: si está instalado, la similitud de nombres se calcula en C
+try:
+    from rapidfuzz import process as rf_process
+    from rapidfuzz.distance import Levenshtein as rf_levenshtein
+except ImportError:
+    rf_process = None
+    rf_levenshtein = None
+
+# orjson es opcional: acelera la lectura y escritura de las cachés JSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pygit2 es opcional: permite buscar en el historial sin lanzar procesos git
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
 
 init(autoreset=True)
 
@@ -22,10 +48,114 @@ COMMITS_LIST_FILE = ".smart_cherry_pick_commits.json"
 LOG_FILE = ".smart_cherry_pick_log.txt"
 CONFIG_FILE = ".smart_cherry_pick_config.json"
 STATS_FILE = ".smart_cherry_pick_stats.csv"
-TEMP_FILES = [COMMIT_DEP_CACHE]
+ADDING_COMMIT_CACHE = ".smart_cherry_pick_adding_commits.json"
+BLAME_CACHE = ".smart_cherry_pick_blame_cache.json"
+COMMIT_FILES_CACHE = ".smart_cherry_pick_commit_files.json"
+RENAMES_FILE = ".smart_cherry_pick_renames.json"
+FETCH_STATE_FILE = ".smart_cherry_pick_fetch_state.json"
+
+# Expresiones regulares compiladas una sola vez. Los patrones de includes se
+# combinan en una alternancia para recorrer el contenido del archivo una vez.
+INCLUDE_RE = re.compile("|".join([
+    r'#\s*include\s*[<"]([^>"]+)[>"]',
+    r'import\s+[\'"]([^\'"]+)[\'"]',
+    r'from\s+[\'"]([^\'"]+)[\'"]',
+    r'require\s*\(\s*[\'"]([^\'"]+)[\'"]\s*\)',
+    r'@import\s+[\'"]([^\'"]+)[\'"]',
+    r'<link[^>]+href=[\'"]([^\'"]+)[\'"]',
+]))
+EMAIL_GITHUB_RE = re.compile(r'^([^@]+)@github\.com$')
+EMAIL_NOREPLY_RE = re.compile(r'^([^@+]+)(?:\+[^@]+)?@users\.noreply\.github\.com$')
+EMAIL_USER_RE = re.compile(r'^([^@]+)@')
+# Cabecera de `git blame --incremental`: "<sha> <línea original> <línea final> <n>"
+BLAME_HEADER_RE = re.compile(r'^([0-9a-f]{40}) \d+ \d+', re.MULTILINE)
+NOT_EXIST_RE = re.compile(r'^error: ([^:\n]+): does not exist in index', re.MULTILINE)
+IDENTIFIER_RE = re.compile(r'\w+')
+# Entradas de `git status -s` con conflictos: código XY y ruta
+STATUS_CONFLICT_RE = re.compile(r'^(DU|UD|AA|UU) (.+)$', re.MULTILINE)
+
+def _line_regex(pattern):
+    # Se buscan sobre todas las líneas del archivo unidas por "\n": \s y las
+    # clases negadas ([^...]) también aceptarían el salto de línea, así que se
+    # excluye y ninguna coincidencia pasa de una línea a la siguiente
+    return re.compile(pattern.replace('[^', r'[^\n').replace(r'\s', r'[^\S\n]'))
+
+# Patrones para extraer símbolos según la extensión del archivo, compilados
+# una sola vez en lugar de en cada llamada a get_blame_and_grep_dependencies
+LANGUAGE_PATTERNS = {
+    ".py": {
+        "imports": [
+            _line_regex(r'import\s+([a-zA-Z0-9_.]+)'),
+            _line_regex(r'from\s+([a-zA-Z0-9_.]+)\s+import'),
+        ],
+        "functions": [
+            _line_regex(r'def\s+([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'([a-zA-Z0-9_]+)\s*\(')
+        ]
+    },
+    ".js": {
+        "imports": [
+            _line_regex(r'import\s+.*\s+from\s+[\'"]([^\'"]+)[\'"]'),
+            _line_regex(r'require\s*\(\s*[\'"]([^\'"]+)[\'"]\s*\)'),
+        ],
+        "functions": [
+            _line_regex(r'function\s+([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'const\s+([a-zA-Z0-9_]+)\s*=\s*\('),
+            _line_regex(r'let\s+([a-zA-Z0-9_]+)\s*=\s*\('),
+            _line_regex(r'var\s+([a-zA-Z0-9_]+)\s*=\s*\('),
+            _line_regex(r'([a-zA-Z0-9_]+)\s*:\s*function')
+        ]
+    },
+    ".c": {
+        "imports": [
+            _line_regex(r'#\s*include\s*[<"]([^>"]+)[>"]'),
+        ],
+        "functions": [
+            _line_regex(r'([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'typedef\s+struct\s+([a-zA-Z0-9_]+)')
+        ]
+    },
+    ".cpp": {
+        "imports": [
+            _line_regex(r'#\s*include\s*[<"]([^>"]+)[>"]'),
+        ],
+        "functions": [
+            _line_regex(r'([a-zA-Z0-9_:]+)::[a-zA-Z0-9_]+\s*\('),
+            _line_regex(r'([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'class\s+([a-zA-Z0-9_]+)')
+        ]
+    },
+    ".h": {
+        "imports": [
+            _line_regex(r'#\s*include\s*[<"]([^>"]+)[>"]'),
+        ],
+        "functions": [
+            _line_regex(r'([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'typedef\s+struct\s+([a-zA-Z0-9_]+)'),
+            _line_regex(r'class\s+([a-zA-Z0-9_]+)')
+        ]
+    },
+    ".java": {
+        "imports": [
+            _line_regex(r'import\s+([a-zA-Z0-9_.]+)'),
+        ],
+        "functions": [
+            _line_regex(r'([a-zA-Z0-9_]+)\s*\('),
+            _line_regex(r'class\s+([a-zA-Z0-9_]+)'),
+            _line_regex(r'interface\s+([a-zA-Z0-9_]+)')
+        ]
+    }
+}
+GENERIC_PATTERNS = {
+    "functions": [_line_regex(r'([a-zA-Z0-9_]+)\s*\(')]
+}
 
-cherry_pick_queue = []
-final_commits = []
+# Diccionarios con valor None: conservan el orden de inserción y permiten
+# comprobar la pertenencia en O(1)
+cherry_pick_queue = {}
+final_commits = {}
+# Unión de final_commits y cherry_pick_queue, mantenida al añadir commits
+pending_commits = set()
 analyzed_commits = set()
 applied_commits = set()
 file_renames = {}
@@ -33,11 +163,19 @@ stop_analysis = False
 initial_commit = None
 initial_commits = []
 author_map = {}
+adding_commit_cache = {}
+# Commits de `git blame` por "<oid de la referencia>:<archivo>"; el oid no
+# cambia, así que las entradas nunca caducan
+blame_cache = {}
+# Archivos de cada commit por oid completo; un commit no cambia, así que se
+# conservan entre ejecuciones
+commit_files_cache = {}
 skipped_commits = set()
 remote_name = None
 auto_mode = False
 verbose_mode = False
 dry_run = False
+force_fetch = False
 start_time = time.time()
 processed_missing_files = set()  
 created_files = set()  
@@ -53,33 +191,67 @@ config = {
     "max_retries": 3,
     "retry_delay": 2,
     "record_stats": True,
+    "analysis_workers": 8,
+    "write_commit_graph": True,
+    "fetch_ttl": 300,
 }
 
-def clean_temp_files():
-    for f in TEMP_FILES:
-        if os.path.exists(f):
-            try:
-                os.remove(f)
-            except Exception:
-                pass
+def _parse_bool(value):
+    return value.lower() in ["true", "yes", "1", "t", "y"]
+
+# Conversión de cada opción de `--config KEY=VALUE`, según el tipo de su
+# valor por defecto (bool antes que int: True también es un int)
+CONFIG_PARSERS = {
+    key: _parse_bool if isinstance(value, bool)
+    else int if isinstance(value, int)
+    else float if isinstance(value, float)
+    else str
+    for key, value in config.items()
+}
+
+# El archivo de log se abre una sola vez (al primer mensaje) y se mantiene
+# abierto; logging además serializa las escrituras de distintos hilos
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "SUCCESS": SUCCESS,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR
+}
+LEVEL_COLORS = {
+    "INFO": Fore.BLUE,
+    "WARNING": Fore.YELLOW,
+    "ERROR": Fore.RED,
+    "SUCCESS": Fore.GREEN,
+    "DEBUG": Fore.MAGENTA
+}
 
-clean_temp_files()
-atexit.register(clean_temp_files)
+logger = logging.getLogger("smart_cherry_pick")
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+class BufferedFileHandler(logging.FileHandler):
+    # FileHandler vacía el archivo tras cada mensaje; aquí los INFO y DEBUG
+    # se quedan en el buffer y solo SUCCESS o más graves (y el cierre al
+    # salir, vía logging.shutdown) lo escriben en disco
+    def flush(self):
+        pass
+
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= SUCCESS and self.stream is not None:
+            self.stream.flush()
+
+_log_handler = BufferedFileHandler(LOG_FILE, mode="a", delay=True)
+_log_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+logger.addHandler(_log_handler)
 
 def log_message(message, level="INFO"):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"{timestamp} [{level}] {message}\n")
+    logger.log(LOG_LEVELS.get(level, logging.INFO), message)
 
     if verbose_mode:
-        level_colors = {
-            "INFO": Fore.BLUE,
-            "WARNING": Fore.YELLOW,
-            "ERROR": Fore.RED,
-            "SUCCESS": Fore.GREEN,
-            "DEBUG": Fore.MAGENTA
-        }
-        color = level_colors.get(level, "")
+        color = LEVEL_COLORS.get(level, "")
         print(f"{color}[{level}] {message}")
 
 def init_stats_file():
@@ -99,10 +271,32 @@ def init_stats_file():
         "auto_mode"
     ]
     
-    if not os.path.exists(STATS_FILE):
-        with open(STATS_FILE, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
+    # Modo "a": crea el archivo si no existe sin comprobarlo antes; la
+    # cabecera solo se escribe si está vacío
+    with open(STATS_FILE, "a", newline="") as f:
+        if f.tell() == 0:
+            csv.writer(f).writerow(headers)
+
+# El CSV de estadísticas se abre una sola vez (con la primera fila) y las
+# filas quedan en el buffer del archivo hasta que se cierra al salir
+_stats_file = None
+_stats_writer = None
+
+def _get_stats_writer():
+    global _stats_file, _stats_writer
+    if _stats_writer is None:
+        _stats_file = open(STATS_FILE, "a", newline="")
+        _stats_writer = csv.writer(_stats_file)
+    return _stats_writer
+
+def close_stats_file():
+    global _stats_file, _stats_writer
+    if _stats_file is not None:
+        _stats_file.close()
+    _stats_file = None
+    _stats_writer = None
+
+atexit.register(close_stats_file)
 
 def record_stats(commit, operation, status, duration_ms=0, file_count=0, 
                 conflict_count=0, resolution_method="", remote="", auto_mode=False):
@@ -111,20 +305,18 @@ def record_stats(commit, operation, status, duration_ms=0, file_count=0,
     
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    with open(STATS_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            timestamp, 
-            commit, 
-            operation, 
-            status, 
-            duration_ms,
-            file_count, 
-            conflict_count, 
-            resolution_method,
-            remote, 
-            "true" if auto_mode else "false"
-        ])
+    _get_stats_writer().writerow([
+        timestamp, 
+        commit, 
+        operation, 
+        status, 
+        duration_ms,
+        file_count, 
+        conflict_count, 
+        resolution_method,
+        remote, 
+        "true" if auto_mode else "false"
+    ])
 
 def start_operation_timer(commit, operation):
     global stats_data
@@ -168,55 +360,570 @@ def load_config():
     global config
     if os.path.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                loaded_config = json.load(f)
-                config.update(loaded_config)
+            config.update(read_json_file(CONFIG_FILE))
         except Exception as e:
             log_message(f"Error al cargar configuración: {str(e)}", "ERROR")
 
 def save_config():
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
-
-def run(cmd, capture_output=True, input_text=None, retry=0, allow_fail=False):
-
-    if remote_name and f"{remote_name}/" in cmd:
-        if ("git log" in cmd and ".." in cmd) or ("git show" in cmd and ":" in cmd):
-            try:
-                if verbose_mode:
-                    log_message(f"Ejecutando: {cmd}", "DEBUG")
-                result = subprocess.run(cmd, shell=True, capture_output=capture_output, text=True, input=input_text)
-                if result.returncode == 0:
-                    return result.stdout.strip() if capture_output else None
-                local_cmd = cmd.replace(f"{remote_name}/", "")
-                if verbose_mode:
-                    log_message(f"Fallo remoto, intento local: {local_cmd}", "DEBUG")
-                return run(local_cmd, capture_output, input_text, retry, allow_fail)
-            except Exception:
-                local_cmd = cmd.replace(f"{remote_name}/", "")
-                return run(local_cmd, capture_output, input_text, retry, allow_fail)
+    write_json_file(CONFIG_FILE, config)
+
+# Entorno para los git cuya salida se procesa: sin traducciones ni paginador,
+# y sin que las lecturas tomen index.lock para refrescar el índice
+GIT_ENV = {**os.environ, "LC_ALL": "C", "GIT_OPTIONAL_LOCKS": "0", "GIT_PAGER": "cat"}
+
+def _spawn(cmd, capture_output, input_text, merge_stderr=False):
+    # Los comandos en texto se separan con shlex y nunca pasan por /bin/sh:
+    # ninguna llamada necesita tuberías ni redirecciones, y así una ruta con
+    # caracteres especiales no puede interpretarse como sintaxis de shell
+    args = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+    kwargs = {"capture_output": capture_output}
+    if merge_stderr and capture_output:
+        # Equivalente a `2>&1` sin pasar por /bin/sh
+        kwargs = {"stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+    if capture_output:
+        # La salida que ve el usuario conserva su idioma
+        kwargs["env"] = GIT_ENV
+    return subprocess.run(args, text=True, input=input_text, **kwargs)
+
+def _strip_remote(cmd):
+    if isinstance(cmd, str):
+        return cmd.replace(f"{remote_name}/", "")
+    return [arg.replace(f"{remote_name}/", "") for arg in cmd]
+
+def _command_text(cmd):
+    return cmd if isinstance(cmd, str) else shlex.join(cmd)
+
+def _run_remote_first(cmd, capture_output, input_text, retry, allow_fail, merge_stderr):
+    # Comandos que leen `remote/rama`: se intentan tal cual y, si fallan, con
+    # la referencia local. Devuelve None si el comando no es de ese tipo
+    cmd_text = _command_text(cmd)
+    if f"{remote_name}/" not in cmd_text:
+        return None
+    if not (("git log" in cmd_text and ".." in cmd_text) or ("git show" in cmd_text and ":" in cmd_text)):
+        return None
     try:
         if verbose_mode:
-            log_message(f"Ejecutando: {cmd}", "DEBUG")
-        result = subprocess.run(cmd, shell=True, capture_output=capture_output, text=True, input=input_text)
+            log_message(f"Ejecutando: {cmd_text}", "DEBUG")
+        result = _spawn(cmd, capture_output, input_text, merge_stderr)
+        if result.returncode == 0:
+            return result.stdout.strip() if capture_output else ""
+        local_cmd = _strip_remote(cmd)
+        if verbose_mode:
+            log_message(f"Fallo remoto, intento local: {local_cmd}", "DEBUG")
+    except Exception:
+        local_cmd = _strip_remote(cmd)
+    return run(local_cmd, capture_output, input_text, retry, allow_fail, merge_stderr) or ""
+
+def run(cmd, capture_output=True, input_text=None, retry=0, allow_fail=False, merge_stderr=False):
+    # `cmd` puede ser una cadena o una lista de argumentos ya separados;
+    # merge_stderr incluye la salida de error en el resultado (como `2>&1`).
+    # El texto del comando solo se construye cuando hace falta (remote,
+    # modo verbose o errores): en el caso local normal no se toca
+    if remote_name:
+        output = _run_remote_first(cmd, capture_output, input_text, retry, allow_fail, merge_stderr)
+        if output is not None:
+            return output if capture_output else None
+    try:
+        if verbose_mode:
+            log_message(f"Ejecutando: {_command_text(cmd)}", "DEBUG")
+        result = _spawn(cmd, capture_output, input_text, merge_stderr)
         if result.returncode != 0:
             if allow_fail:
                 return ""
             elif retry < config["max_retries"]:
-                log_message(f"Comando falló. Reintento {retry+1}/{config['max_retries']}: {cmd}", "WARNING")
+                log_message(f"Comando falló. Reintento {retry+1}/{config['max_retries']}: {_command_text(cmd)}", "WARNING")
                 time.sleep(config["retry_delay"])
-                return run(cmd, capture_output, input_text, retry + 1, allow_fail)
+                return run(cmd, capture_output, input_text, retry + 1, allow_fail, merge_stderr)
         return result.stdout.strip() if capture_output else None
     except Exception as e:
         if allow_fail:
             return ""
-        log_message(f"Error ejecutando comando '{cmd}': {str(e)}", "ERROR")
+        log_message(f"Error ejecutando comando '{_command_text(cmd)}': {str(e)}", "ERROR")
         if retry < config["max_retries"]:
             log_message(f"Reintento {retry+1}/{config['max_retries']}", "WARNING")
             time.sleep(config["retry_delay"])
-            return run(cmd, capture_output, input_text, retry + 1, allow_fail)
+            return run(cmd, capture_output, input_text, retry + 1, allow_fail, merge_stderr)
         return ""
 
+# Fetches ya realizados en esta ejecución: (remote, ref) -> instante del fetch.
+# Un fetch de un commit concreto no se repite; el del remote completo caduca
+# tras config["fetch_ttl"] segundos, también entre ejecuciones
+_fetched_refs = {}
+_fetch_lock = threading.Lock()
+
+def remote_fetch_age(remote):
+    # Segundos desde el último fetch completo del remote (en esta ejecución o
+    # en otra anterior), o None si no consta ninguno
+    fetched_at = _fetched_refs.get((remote, None))
+    if fetched_at is None:
+        saved = load_fetch_state().get(remote)
+        if saved is None or saved > time.time():
+            return None
+        fetched_at = _fetched_refs[(remote, None)] = time.monotonic() - (time.time() - saved)
+    return time.monotonic() - fetched_at
+
+def _run_fetch(cmd, capture_output, allow_fail):
+    # Como run(), con los mismos reintentos, pero devuelve si el fetch terminó
+    # bien: run() devuelve "" tanto si falla como si no escribe nada
+    retries = 0 if allow_fail else config["max_retries"]
+    for attempt in range(retries + 1):
+        if attempt:
+            log_message(f"Comando falló. Reintento {attempt}/{retries}: {_command_text(cmd)}", "WARNING")
+            time.sleep(config["retry_delay"])
+        try:
+            if verbose_mode:
+                log_message(f"Ejecutando: {_command_text(cmd)}", "DEBUG")
+            if _spawn(cmd, capture_output, None).returncode == 0:
+                return True
+        except Exception as e:
+            if not allow_fail:
+                log_message(f"Error ejecutando comando '{_command_text(cmd)}': {str(e)}", "ERROR")
+    return False
+
+def ensure_remote_fetched(remote=None, ref=None, capture_output=True, allow_fail=True, force=False):
+    remote = remote or remote_name
+    key = (remote, ref)
+    with _fetch_lock:
+        if ref is not None:
+            if key in _fetched_refs:
+                return True
+        elif not force:
+            age = remote_fetch_age(remote)
+            if age is not None and age < config["fetch_ttl"]:
+                return True
+        cmd = ["git", "fetch", remote, ref] if ref else ["git", "fetch", remote]
+        # Solo se anota (y se guarda para otras ejecuciones) un fetch que
+        # terminó bien: si falla, la siguiente llamada lo vuelve a intentar
+        if not _run_fetch(cmd, capture_output, allow_fail):
+            return False
+        _fetched_refs[key] = time.monotonic()
+        if ref is None:
+            save_fetch_time(remote)
+        return True
+
+def load_fetch_state():
+    # remote -> instante (epoch) del último `git fetch <remote>` completo,
+    # compartido entre ejecuciones
+    if os.path.exists(FETCH_STATE_FILE):
+        try:
+            return read_json_file(FETCH_STATE_FILE)
+        except:
+            pass
+    return {}
+
+def save_fetch_time(remote):
+    state = load_fetch_state()
+    state[remote] = time.time()
+    write_json_file(FETCH_STATE_FILE, state)
+
+def fetch_missing_commits(commits, remote=None):
+    # Trae de una vez todos los commits pedidos que aún no están en local, en
+    # lugar de un `git fetch <remote> <commit>` por cada uno durante el análisis
+    remote = remote or remote_name
+    if not remote:
+        return
+    with _fetch_lock:
+        missing = [
+            c for c in dict.fromkeys(commits)
+            if (remote, c) not in _fetched_refs and not commit_exists(c)
+        ]
+        if not missing:
+            return
+        if verbose_mode:
+            log_message(f"Trayendo {len(missing)} commits de '{remote}' en un único fetch", "DEBUG")
+        try:
+            result = subprocess.run(
+                ["git", "fetch", "--no-tags", remote, *missing],
+                capture_output=True, text=True
+            )
+        except Exception as e:
+            log_message(f"Error al traer commits de '{remote}': {str(e)}", "ERROR")
+            return
+        # Si alguno no existe en el remote falla el fetch entero; en ese caso
+        # cada commit se sigue trayendo por separado cuando haga falta
+        if result.returncode == 0:
+            now = time.monotonic()
+            for c in missing:
+                _fetched_refs[(remote, c)] = now
+
+# Procesos persistentes de `git cat-file --batch` (contenido) y
+# `--batch-check` (solo oid, tipo y tamaño) para leer objetos sin lanzar un
+# `git show` o un `git rev-parse` por cada consulta. Cada hilo tiene los suyos,
+# así las consultas en paralelo no se esperan entre sí.
+_cat_file_local = threading.local()
+# (hilo, modo) -> proceso, para cerrar los de hilos ya terminados (p. ej. de un pool)
+_cat_file_procs = {}
+_cat_file_procs_lock = threading.Lock()
+
+def _get_cat_file_proc(mode="--batch"):
+    procs = getattr(_cat_file_local, "procs", None)
+    if procs is None:
+        procs = _cat_file_local.procs = {}
+    proc = procs.get(mode)
+    if proc is None or proc.poll() is not None:
+        proc = subprocess.Popen(
+            ["git", "cat-file", mode],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=GIT_ENV
+        )
+        procs[mode] = proc
+        with _cat_file_procs_lock:
+            finished = [key for key in _cat_file_procs if not key[0].is_alive()]
+            stale = [_cat_file_procs.pop(key) for key in finished]
+            _cat_file_procs[(threading.current_thread(), mode)] = proc
+        for old in stale:
+            _close_cat_file_proc(old)
+    return proc
+
+def _close_cat_file_proc(proc):
+    try:
+        proc.stdin.close()
+        proc.wait(timeout=5)
+    except Exception:
+        proc.kill()
+
+def close_cat_file(mode="--batch"):
+    # Cierra el proceso del hilo actual; se vuelve a abrir en la siguiente consulta
+    procs = getattr(_cat_file_local, "procs", None)
+    proc = procs.pop(mode, None) if procs else None
+    if proc is None:
+        return
+    with _cat_file_procs_lock:
+        _cat_file_procs.pop((threading.current_thread(), mode), None)
+    _close_cat_file_proc(proc)
+
+def close_all_cat_files():
+    with _cat_file_procs_lock:
+        procs = list(_cat_file_procs.values())
+        _cat_file_procs.clear()
+    for proc in procs:
+        _close_cat_file_proc(proc)
+
+atexit.register(close_all_cat_files)
+
+def _cat_file_read(spec):
+    # Devuelve (oid, contenido) del objeto `spec`, o (None, None) si no existe
+    if "\n" in spec:
+        return None, None
+
+    try:
+        proc = _get_cat_file_proc()
+        proc.stdin.write(spec.encode() + b"\n")
+        proc.stdin.flush()
+        header = proc.stdout.readline().split()
+        # "<oid> <tipo> <tamaño>" o "<spec> missing" / "<spec> ambiguous"; con
+        # espacios en la ruta, "<spec> missing" también puede dar tres campos
+        if len(header) != 3 or not header[2].isdigit():
+            return None, None
+        size = int(header[2])
+        data = proc.stdout.read(size + 1)
+        return header[0].decode(), data[:size]
+    except Exception as e:
+        log_message(f"Error leyendo {spec} con git cat-file: {str(e)}", "ERROR")
+        close_cat_file()
+        return None, None
+
+def _cat_file_check(spec):
+    # Como _cat_file_read pero sin leer el contenido: devuelve el oid o None
+    if "\n" in spec:
+        return None
+
+    try:
+        proc = _get_cat_file_proc("--batch-check")
+        proc.stdin.write(spec.encode() + b"\n")
+        proc.stdin.flush()
+        header = proc.stdout.readline().split()
+        # Las rutas con espacios también dan tres campos en "<spec> missing"
+        if len(header) != 3 or not header[2].isdigit():
+            return None
+        return header[0].decode()
+    except Exception as e:
+        log_message(f"Error consultando {spec} con git cat-file: {str(e)}", "ERROR")
+        close_cat_file("--batch-check")
+        return None
+
+def git_show(ref, path=None):
+    """Devuelve el contenido (bytes) de `ref` o `ref:path`, o None si no existe."""
+    spec = f"{ref}:{path}" if path is not None else ref
+    return _cat_file_read(spec)[1]
+
+def git_object_oid(spec):
+    """Devuelve el oid al que resuelve `spec`, o None si no existe."""
+    return _cat_file_check(spec)
+
+# Referencias que ya se comprobó que apuntan a un commit. Sólo se guardan los
+# aciertos: un fetch posterior puede hacer aparecer una referencia ausente
+_existing_commit_refs = set()
+
+def commit_exists(ref):
+    # Equivalente a `git rev-parse --verify ref^{commit}` sin lanzar un proceso
+    if ref in _existing_commit_refs:
+        return True
+    if git_object_oid(f"{ref}^{{commit}}") is None:
+        return False
+    _existing_commit_refs.add(ref)
+    return True
+
+# Commit -> referencia con la que se lee (`<remote>/<commit>` o el propio
+# commit). El remote no cambia durante la ejecución: cada commit se resuelve
+# una vez, tanto si se consulta suelto como por lotes
+_commit_ref_cache = {}
+
+def resolve_commit_ref(commit):
+    # Prefiere `<remote>/<commit>` si existe, como hacía cada llamada a rev-parse
+    ref = _commit_ref_cache.get(commit)
+    if ref is None:
+        ref = commit
+        if remote_name:
+            remote_ref = f"{remote_name}/{commit}"
+            if commit_exists(remote_ref):
+                ref = remote_ref
+        _commit_ref_cache[commit] = ref
+    return ref
+
+def resolve_commit_refs(commits):
+    # Versión por lotes de resolve_commit_ref: un único `git cat-file
+    # --batch-check` responde a todas las consultas aún no resueltas
+    commits = [c for c in commits if "\n" not in c]
+    if not remote_name:
+        return {c: c for c in commits}
+    pending = [c for c in dict.fromkeys(commits) if c not in _commit_ref_cache]
+    if pending:
+        specs = "".join(f"{remote_name}/{c}^{{commit}}\n" for c in pending)
+        try:
+            result = subprocess.run(
+                ["git", "cat-file", "--batch-check"],
+                input=specs, capture_output=True, text=True, env=GIT_ENV
+            )
+            lines = result.stdout.splitlines()
+        except Exception as e:
+            log_message(f"Error resolviendo referencias con git cat-file: {str(e)}", "ERROR")
+            lines = None
+        if lines is not None:
+            for idx, commit in enumerate(pending):
+                # "<oid> commit <tamaño>" si existe; "<spec> missing" en caso contrario
+                found = idx < len(lines) and len(lines[idx].split()) == 3
+                _commit_ref_cache[commit] = f"{remote_name}/{commit}" if found else commit
+    return {c: _commit_ref_cache.get(c, c) for c in commits}
+
+def read_commit_parents(refs):
+    # Un único `git cat-file --batch` devuelve, para cada referencia, su oid,
+    # los oids de sus padres y la fecha del committer:
+    # {ref: (oid, [padres], timestamp)}
+    refs = [r for r in refs if "\n" not in r]
+    if not refs:
+        return {}
+    specs = "".join(f"{r}^{{commit}}\n" for r in refs).encode()
+    try:
+        output = subprocess.run(["git", "cat-file", "--batch"], input=specs, capture_output=True, env=GIT_ENV).stdout
+    except Exception as e:
+        log_message(f"Error leyendo commits con git cat-file: {str(e)}", "ERROR")
+        return {}
+    parents = {}
+    pos = 0
+    for ref in refs:
+        end = output.find(b"\n", pos)
+        if end < 0:
+            break
+        header = output[pos:end].split()
+        pos = end + 1
+        # "<oid> <tipo> <tamaño>" seguido del contenido, o "<spec> missing"
+        if len(header) != 3:
+            continue
+        size = int(header[2])
+        body = output[pos:pos + size]
+        pos += size + 1
+        headers = body.partition(b"\n\n")[0].split(b"\n")
+        committed_at = 0
+        for line in headers:
+            # "committer Nombre <correo> <timestamp> <zona>"
+            if line.startswith(b"committer "):
+                fields = line.rsplit(b" ", 2)
+                if len(fields) == 3 and fields[1].isdigit():
+                    committed_at = int(fields[1])
+        parents[ref] = (
+            header[0].decode(),
+            [line[7:].decode() for line in headers if line.startswith(b"parent ")],
+            committed_at
+        )
+    return parents
+
+def order_commits_topologically(commits, commit_parents):
+    # Algoritmo de Kahn sobre los commits de la lista: un commit nunca se
+    # aplica antes que un padre suyo que también esté en la lista. Entre los
+    # disponibles se elige el de fecha de committer más antigua (y, a igual
+    # fecha, el que estaba antes), así las dependencias indirectas también
+    # quedan delante. Los commits sin información conservan su posición
+    oid_to_commit = {}
+    for commit in commits:
+        info = commit_parents.get(commit)
+        if info:
+            oid_to_commit.setdefault(info[0], commit)
+
+    pending_parents = {}
+    children = collections.defaultdict(list)
+    for commit in commits:
+        info = commit_parents.get(commit)
+        selected = {oid_to_commit[p] for p in info[1] if p in oid_to_commit} if info else set()
+        selected.discard(commit)
+        pending_parents[commit] = len(selected)
+        for parent in selected:
+            children[parent].append(commit)
+
+    position = {commit: idx for idx, commit in enumerate(commits)}
+
+    def priority(commit):
+        info = commit_parents.get(commit)
+        return (info[2] if info else 0, position[commit], commit)
+
+    ready = [priority(c) for c in commits if c in commit_parents and pending_parents[c] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        commit = heapq.heappop(ready)[2]
+        ordered.append(commit)
+        for child in children[commit]:
+            pending_parents[child] -= 1
+            if pending_parents[child] == 0:
+                heapq.heappush(ready, priority(child))
+
+    if len(ordered) != len(position) - sum(1 for c in commits if c not in commit_parents):
+        # No debería haber ciclos en el historial; ante la duda, orden original
+        return list(commits)
+
+    # Los commits sin información vuelven a su hueco original
+    result = []
+    known = iter(ordered)
+    for commit in commits:
+        result.append(next(known) if commit in commit_parents else commit)
+    return result
+
+def get_commit_message(ref):
+    # Equivalente a `git log -1 --pretty=format:%B ref`: el mensaje va tras la
+    # primera línea vacía del objeto commit
+    data = git_show(f"{ref}^{{commit}}")
+    if data is None:
+        return ""
+    _, _, message = data.partition(b"\n\n")
+    return message.decode("utf-8", errors="replace").strip()
+
+def read_file_at(ref, path):
+    # Como `run(f"git show {ref}:{path}")`: texto sin espacios finales, o "" si no existe
+    data = git_show(ref, path)
+    if data is None:
+        return ""
+    return data.decode("utf-8", errors="replace").strip()
+
+def read_picked_file(path):
+    # Contenido (bytes) de `path` en el commit que se está aplicando: durante un
+    # cherry-pick es CHERRY_PICK_HEAD; MERGE_HEAD queda para los merges
+    for ref in ("CHERRY_PICK_HEAD", "MERGE_HEAD"):
+        data = git_show(ref, path)
+        if data is not None:
+            return data
+    return None
+
+def write_worktree_file(path, data):
+    # Escribe los bytes tal cual (sin perder el salto de línea final ni romper
+    # archivos binarios), creando los directorios que falten
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def get_unmerged_files():
+    # Archivos con conflictos, leídos de las entradas en stage 1-3 del índice.
+    # Con -z las rutas llegan sin comillas; cada archivo aparece una vez por stage
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-u", "-z", "--full-name", "--", ":/"],
+            capture_output=True, env=GIT_ENV
+        )
+    except Exception as e:
+        log_message(f"Error al leer los conflictos del índice: {str(e)}", "ERROR")
+        return []
+    files = dict.fromkeys(
+        entry.partition(b"\t")[2].decode("utf-8", errors="surrogateescape")
+        for entry in result.stdout.split(b"\0") if entry
+    )
+    return list(files)
+
+@functools.lru_cache(maxsize=1)
+def git_index_path():
+    # Ruta absoluta del índice (respeta GIT_INDEX_FILE y los worktrees)
+    path = run(["git", "rev-parse", "--git-path", "index"], allow_fail=True)
+    return os.path.abspath(path) if path else None
+
+def index_generation():
+    # Cada operación que modifica el índice (add, rm, reset, cherry-pick,
+    # commit...) lo reescribe por completo: su stat sirve de número de versión
+    path = git_index_path()
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=1)
+def _status_snapshot(generation):
+    return run(["git", "status"], allow_fail=True), run(["git", "status", "-s"], allow_fail=True)
+
+def git_status_snapshot():
+    # `git status` (largo y corto) de la versión actual del índice: las
+    # lecturas repetidas durante un mismo intento de cherry-pick no relanzan git
+    return _status_snapshot(index_generation())
+
+def parse_conflict_status(status_short):
+    # Ruta -> código XY de los conflictos en la salida de `git status -s`,
+    # en una sola pasada y conservando el orden
+    return {m.group(2).strip(): m.group(1) for m in STATUS_CONFLICT_RE.finditer(status_short)}
+
+def parse_modify_delete(status_short):
+    # Archivos en conflicto modify/delete (DU = deleted by us, UD = deleted by
+    # them) de la salida de `git status -s`, como conjunto ordenado
+    return {path: None for path, code in parse_conflict_status(status_short).items() if code in ("DU", "UD")}
+
+def read_conflict_status():
+    # Un solo `git status --porcelain=v2 -z` para el manejo de errores: devuelve
+    # la salida completa (con los errores de git, que llegan por stderr) y los
+    # archivos con conflictos, tomados de las entradas "u"
+    output = run(["git", "status", "--porcelain=v2", "-z"], allow_fail=True, merge_stderr=True)
+    unmerged = {}
+    fields = iter(output.split("\0"))
+    for field in fields:
+        if field.startswith("u "):
+            # "u <XY> <sub> <m1> <m2> <m3> <mW> <h1> <h2> <h3> <ruta>"
+            parts = field.split(" ", 10)
+            if len(parts) == 11:
+                unmerged.setdefault(parts[10])
+        elif field.startswith("2 "):
+            # Las entradas de renombre llevan la ruta original en el campo siguiente
+            next(fields, None)
+    return output, list(unmerged)
+
+def list_untracked_files():
+    # Archivos sin seguimiento y no ignorados, relativos a la raíz del repositorio
+    output = run(["git", "ls-files", "-z", "--others", "--exclude-standard", "--full-name", "--", ":/"], allow_fail=True)
+    return [f for f in output.split("\0") if f]
+
+# Rutas por invocación de `git add`/`git rm`, para no acercarse a ARG_MAX
+GIT_PATHS_CHUNK = 200
+
+def git_stage_paths(paths, remove=False):
+    # Un único `git add` (o `git rm`) por bloque de rutas en lugar de uno por
+    # archivo. Si el bloque falla (p. ej. una ruta que ya no existe) se repite
+    # archivo a archivo para que el resto se siga añadiendo
+    paths = list(dict.fromkeys(paths))
+    base = ["git", "rm"] if remove else ["git", "add"]
+    for i in range(0, len(paths), GIT_PATHS_CHUNK):
+        chunk = paths[i:i + GIT_PATHS_CHUNK]
+        result = subprocess.run(base + ["--"] + chunk, capture_output=True, text=True)
+        if result.returncode != 0 and len(chunk) > 1:
+            for path in chunk:
+                subprocess.run(base + ["--", path], capture_output=True, text=True)
+
 def select_option(options, prompt="Selecciona una opción: "):
     if auto_mode:
         log_message(f"Modo automático: seleccionando opción por defecto '{options[0]}'", "INFO")
@@ -235,59 +942,197 @@ def select_option(options, prompt="Selecciona una opción: "):
         print(Fore.RED + "Entrada inválida. Se usará la opción 1.")
         return options[0]
 
+def read_json_file(path):
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_json_file(path, data, compact=False):
+    # Se serializa en memoria, se escribe de una vez en un archivo temporal y
+    # se renombra: una interrupción a mitad nunca deja un JSON truncado
+    if orjson is not None:
+        payload = orjson.dumps(data) if compact else orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    elif compact:
+        payload = json.dumps(data, separators=(",", ":")).encode()
+    else:
+        payload = json.dumps(data, indent=2).encode()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+# Las cachés de dependencias y de commits que agregan archivos solo crecen, así
+# que si su tamaño no cambió desde que se leyeron no hace falta reescribirlas
+_saved_cache_sizes = {}
+
+def save_cache_if_changed(path, cache):
+    if os.path.exists(path) and _saved_cache_sizes.get(path) == len(cache):
+        return
+    write_json_file(path, cache)
+    _saved_cache_sizes[path] = len(cache)
+
+# El historial solo crece: se guarda un hash por línea y cada guardado añade
+# únicamente los commits nuevos en lugar de reescribir el archivo entero.
+# Los commits que ya están en disco se recuerdan en _saved_history
+_saved_history = set()
+_history_is_legacy_json = False
+
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
+    global _history_is_legacy_json
+    if not os.path.exists(HISTORY_FILE):
+        return set()
+    with open(HISTORY_FILE, "r") as f:
+        content = f.read()
+    # Formato antiguo: una lista JSON que se convierte al guardar por primera vez
+    _history_is_legacy_json = content.lstrip().startswith("[")
+    if _history_is_legacy_json:
+        commits = set(json.loads(content))
+    else:
+        commits = {line.strip() for line in content.splitlines() if line.strip()}
+    _saved_history.update(commits)
+    return commits
 
 def save_history(commits):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(sorted(list(commits)), f, indent=2)
+    global _history_is_legacy_json
+    if _history_is_legacy_json:
+        with open(HISTORY_FILE, "w") as f:
+            f.writelines(f"{c}\n" for c in sorted(_saved_history))
+        _history_is_legacy_json = False
+    new_commits = [c for c in commits if c not in _saved_history]
+    if not new_commits:
+        return
+    with open(HISTORY_FILE, "a") as f:
+        f.writelines(f"{c}\n" for c in new_commits)
+    _saved_history.update(new_commits)
+
+# Las dependencias salen del blame y del historial de HEAD (o del remote), no
+# solo del commit analizado, y HEAD avanza con cada cherry-pick. Cada entrada
+# recuerda el oid de la punta con la que se calculó; en disco se agrupan por
+# ese oid y una ejecución solo carga las de la punta de la que parte
+_dep_entry_bases = {}
+
+def dep_cache_base():
+    return git_object_oid(f"{remote_name or 'HEAD'}^{{commit}}")
 
 def load_dep_cache():
-    if os.path.exists(COMMIT_DEP_CACHE):
-        with open(COMMIT_DEP_CACHE, "r") as f:
-            return json.load(f)
+    base = dep_cache_base()
+    if base and os.path.exists(COMMIT_DEP_CACHE):
+        try:
+            data = read_json_file(COMMIT_DEP_CACHE)
+            if "by_base" in data:
+                cache = data["by_base"].get(base, {})
+            else:
+                # Formato anterior: una sola punta para todas las entradas
+                cache = data["entries"] if data.get("base") == base else {}
+            _dep_entry_bases.update(dict.fromkeys(cache, base))
+            _saved_cache_sizes[COMMIT_DEP_CACHE] = len(cache)
+            return cache
+        except Exception:
+            pass
     return {}
 
+def store_dep_entry(dep_cache, cache_key, deps, base):
+    # `base` es la punta leída antes del análisis; si ha cambiado mientras
+    # tanto, la entrada sirve en esta ejecución pero no se guarda en disco
+    dep_cache[cache_key] = deps
+    _dep_entry_bases[cache_key] = base if base and base == dep_cache_base() else None
+
 def save_dep_cache(cache):
-    with open(COMMIT_DEP_CACHE, "w") as f:
-        json.dump(cache, f, indent=2)
+    if os.path.exists(COMMIT_DEP_CACHE) and _saved_cache_sizes.get(COMMIT_DEP_CACHE) == len(cache):
+        return
+    # Copia: los hilos de precarga pueden seguir añadiendo entradas
+    by_base = {}
+    for key, deps in dict(cache).items():
+        base = _dep_entry_bases.get(key)
+        if base:
+            by_base.setdefault(base, {})[key] = deps
+    write_json_file(COMMIT_DEP_CACHE, {"by_base": by_base})
+    _saved_cache_sizes[COMMIT_DEP_CACHE] = len(cache)
 
 def load_author_map():
     if os.path.exists(AUTHOR_MAP_CACHE):
         try:
-            with open(AUTHOR_MAP_CACHE, "r") as f:
-                return json.load(f)
+            map_data = read_json_file(AUTHOR_MAP_CACHE)
+            _saved_cache_sizes[AUTHOR_MAP_CACHE] = len(map_data)
+            return map_data
         except:
             pass
     return {}
 
 def save_author_map(map_data):
-    with open(AUTHOR_MAP_CACHE, "w") as f:
-        json.dump(map_data, f, indent=2)
+    # Las entradas solo se añaden: se escribe únicamente si hay autores nuevos
+    save_cache_if_changed(AUTHOR_MAP_CACHE, map_data)
+
+def load_adding_commit_cache():
+    if os.path.exists(ADDING_COMMIT_CACHE):
+        try:
+            cache = read_json_file(ADDING_COMMIT_CACHE)
+            _saved_cache_sizes[ADDING_COMMIT_CACHE] = len(cache)
+            return cache
+        except:
+            pass
+    return {}
+
+def save_adding_commit_cache(cache):
+    save_cache_if_changed(ADDING_COMMIT_CACHE, cache)
+
+def load_blame_cache():
+    if os.path.exists(BLAME_CACHE):
+        try:
+            cache = read_json_file(BLAME_CACHE)
+            _saved_cache_sizes[BLAME_CACHE] = len(cache)
+            return cache
+        except:
+            pass
+    return {}
+
+def save_blame_cache(cache):
+    save_cache_if_changed(BLAME_CACHE, cache)
+
+def load_commit_files_cache():
+    if os.path.exists(COMMIT_FILES_CACHE):
+        try:
+            cache = read_json_file(COMMIT_FILES_CACHE)
+            _saved_cache_sizes[COMMIT_FILES_CACHE] = len(cache)
+            return cache
+        except:
+            pass
+    return {}
+
+def save_commit_files_cache(cache):
+    # Copia: los hilos de precarga pueden seguir añadiendo entradas
+    save_cache_if_changed(COMMIT_FILES_CACHE, dict(cache))
+
+def save_state(dep_cache):
+    # Historial y cachés del análisis; cada una se escribe solo si cambió
+    save_history(applied_commits)
+    save_dep_cache(dep_cache)
+    save_author_map(author_map)
+    save_adding_commit_cache(adding_commit_cache)
+    save_blame_cache(blame_cache)
+    save_commit_files_cache(commit_files_cache)
 
 def save_commits_list(commits):
-    with open(COMMITS_LIST_FILE, "w") as f:
-        json.dump(commits, f, indent=2)
+    write_json_file(COMMITS_LIST_FILE, commits)
 
 def load_commits_list():
     if os.path.exists(COMMITS_LIST_FILE):
-        with open(COMMITS_LIST_FILE, "r") as f:
-            return json.load(f)
+        return read_json_file(COMMITS_LIST_FILE)
     return []
 
+@functools.lru_cache(maxsize=None)
 def extract_username_from_email(email):
-    match = re.match(r'^([^@]+)@github\.com$', email)
+    match = EMAIL_GITHUB_RE.match(email)
     if match:
         return match.group(1)
 
-    match = re.match(r'^([^@+]+)(?:\+[^@]+)?@users\.noreply\.github\.com$', email)
+    match = EMAIL_NOREPLY_RE.match(email)
     if match:
         return match.group(1)
 
-    match = re.match(r'^([^@]+)@', email)
+    match = EMAIL_USER_RE.match(email)
     if match:
         username = match.group(1).lower()
         if '.' in username or '-' in username:
@@ -311,14 +1156,12 @@ def infer_github_username(author_name, author_email):
 
     if author_name in special_cases:
         author_map[author_name] = special_cases[author_name]
-        save_author_map(author_map)
         return special_cases[author_name]
 
     if author_email:
         username = extract_username_from_email(author_email)
         if username:
             author_map[author_name] = username
-            save_author_map(author_map)
             return username
 
     names = author_name.strip().split()
@@ -326,39 +1169,178 @@ def infer_github_username(author_name, author_email):
         if len(names) == 1 and not names[0].startswith("git"):
             username = names[0].lower()
             author_map[author_name] = username
-            save_author_map(author_map)
             return username
 
     return author_name
 
+@functools.lru_cache(maxsize=4096)
 def get_commit_files(commit):
-    ref = commit
-    if remote_name:
-        remote_ref = f"{remote_name}/{commit}"
-        exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-        if exists:
-            ref = remote_ref
+    ref = resolve_commit_ref(commit)
+    oid = git_object_oid(f"{ref}^{{commit}}")
+    if oid in commit_files_cache:
+        return tuple(commit_files_cache[oid])
     try:
-        files = run(f"git diff-tree --no-commit-id --name-status -r {ref}").splitlines()
+        # Con -z las rutas llegan sin comillas ni escapes, igual que en
+        # all_tracked_files(), y pueden contener espacios
+        fields = iter(run(["git", "diff-tree", "--no-commit-id", "--name-status", "-z", "-r", ref]).split("\0"))
         result = []
-        for line in files:
-            if not line:
+        for status in fields:
+            if not status:
                 continue
-            parts = line.split()
-            if parts[0].startswith('R') and len(parts) >= 3:
-                result.append(parts[2])
-            elif len(parts) >= 2:
-                result.append(parts[1])
-        return result
+            path = next(fields, "")
+            if status[0] in "RC":
+                path = next(fields, path)
+            if path:
+                result.append(path)
+        if oid:
+            commit_files_cache[oid] = result
+        return tuple(result)
     except Exception as e:
         log_message(f"Error al obtener archivos del commit {commit}: {str(e)}", "ERROR")
-        return run(f"git show --pretty='' --name-only {ref}").splitlines()
+        return tuple(run(["git", "show", "--pretty=", "--name-only", ref]).splitlines())
+
+@functools.lru_cache(maxsize=1)
+def all_tracked_files():
+    # Un solo `git ls-files -z` por ejecución; se conserva el orden original y
+    # las rutas llegan sin las comillas que git añade a las no ASCII
+    return tuple(f for f in run(["git", "ls-files", "-z"]).split("\0") if f)
+
+@functools.lru_cache(maxsize=1)
+def tracked_files_set():
+    return frozenset(all_tracked_files())
+
+@functools.lru_cache(maxsize=1)
+def tracked_basenames():
+    # Nombres base alineados con all_tracked_files(), para no recalcularlos
+    # en cada búsqueda de archivos similares
+    return tuple(os.path.basename(f) for f in all_tracked_files())
+
+@functools.lru_cache(maxsize=1)
+def tracked_name_index():
+    # Índices de tracked_basenames() agrupados por nombre sin extensión y por
+    # longitud del nombre, para que find_similar_files no recorra todo el repo
+    by_stem = collections.defaultdict(list)
+    by_length = collections.defaultdict(list)
+    for idx, name in enumerate(tracked_basenames()):
+        by_stem[os.path.splitext(name)[0]].append(idx)
+        by_length[len(name)].append(idx)
+    return by_stem, by_length
+
+@functools.lru_cache(maxsize=1)
+def tracked_trigram_index():
+    # Índices de tracked_basenames() por cada trigrama del nombre; solo se
+    # construye si find_similar_files llega a la búsqueda por fragmentos
+    index = collections.defaultdict(set)
+    for idx, name in enumerate(tracked_basenames()):
+        for i in range(len(name) - 2):
+            index[name[i:i + 3]].add(idx)
+    return index
+
+def tracked_basenames_containing(fragment):
+    # Índices de los nombres que contienen `fragment` (de 3 caracteres o más):
+    # solo se comprueban los que tienen todos sus trigramas
+    index = tracked_trigram_index()
+    postings = sorted((index.get(fragment[i:i + 3], set()) for i in range(len(fragment) - 2)), key=len)
+    names = tracked_basenames()
+    return {idx for idx in postings[0].intersection(*postings[1:]) if fragment in names[idx]}
+
+def invalidate_tracked_files():
+    # Llamar tras operaciones que modifican el índice durante el análisis
+    all_tracked_files.cache_clear()
+    tracked_files_set.cache_clear()
+    tracked_basenames.cache_clear()
+    tracked_name_index.cache_clear()
+    tracked_trigram_index.cache_clear()
+    similar_files_cache.clear()
+
+def is_tracked_path_fragment(path):
+    # Equivalente a `git ls-files | grep -F path` sin lanzar procesos
+    if path in tracked_files_set():
+        return True
+    return any(path in f for f in all_tracked_files())
+
+# Último commit que tocó cada archivo. Sin remote la consulta depende de HEAD,
+# así que las entradas de los archivos de un commit aplicado se descartan
+_last_commit_cache = {}
 
 def get_last_commit_affecting_file(file_path):
-    cmd = f"git log -n 1 --pretty=format:'%H' -- {file_path}"
+    if file_path in _last_commit_cache:
+        return _last_commit_cache[file_path]
+    cmd = ["git", "log", "-n", "1", "--pretty=format:%H", "--", file_path]
     if remote_name:
-        cmd = f"git log -n 1 --pretty=format:'%H' {remote_name} -- {file_path}"
-    return run(cmd).strip("'")
+        cmd = ["git", "log", "-n", "1", "--pretty=format:%H", remote_name, "--", file_path]
+    result = run(cmd)
+    _last_commit_cache[file_path] = result
+    return result
+
+def linear_history(tip):
+    # Commits desde `tip` hasta el primer merge (sin incluirlo), o None si el
+    # historial no tiene merges
+    merge = run(["git", "rev-list", "--merges", "-n", "1", tip], allow_fail=True)
+    if not merge:
+        return None
+    return set(run(["git", "rev-list", tip, f"^{merge}"], allow_fail=True).split())
+
+def precompute_last_commits(files):
+    # Un solo `git log --name-only` sobre todos los archivos: el primer commit
+    # en el que aparece cada uno es el último que lo modificó. La lectura se
+    # corta en cuanto todos los archivos tienen commit.
+    # Al llegar a un merge deja de valer: la simplificación del historial
+    # decide si el merge es TREESAME con todas las rutas a la vez, así que
+    # puede recorrer una rama que `git log -- archivo` descarta. Lo que quede
+    # pendiente a partir de ahí se consulta archivo por archivo
+    pending = {f for f in files if f not in _last_commit_cache}
+    if len(pending) < 2:
+        return
+    tip = remote_name or "HEAD"
+    linear = linear_history(tip)
+    if linear is not None and not linear:
+        return
+    cmd = ["git", "log", "-z", "--no-renames", "--pretty=format:%H", "--name-only", tip]
+    cmd += ["--", *sorted(pending)]
+    found = {}
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=GIT_ENV)
+    buffer = b""
+    current = None
+    done = False
+    try:
+        for chunk in iter(lambda: proc.stdout.read(65536), b""):
+            tokens = (buffer + chunk).split(b"\x00")
+            buffer = tokens.pop()
+            for token in tokens:
+                # "<hash>\n<primer archivo>", luego un archivo por registro y
+                # un registro vacío al final de cada commit
+                if len(token) > 41 and token[40:41] == b"\n":
+                    current = token[:40].decode()
+                    if linear is not None and current not in linear:
+                        done = True
+                        break
+                    token = token[41:]
+                name = token.decode("utf-8", errors="replace")
+                if current and name in pending and name not in found:
+                    found[name] = current
+            if done or len(found) == len(pending):
+                break
+        else:
+            if proc.wait() != 0:
+                return
+            # Un archivo que no aparece en el historial no tiene commit (si
+            # hay merges, lo decide la consulta por archivo)
+            if linear is None:
+                for name in pending:
+                    found.setdefault(name, "")
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    _last_commit_cache.update(found)
+
+def forget_last_commits(files):
+    if remote_name:
+        return
+    for file_path in files:
+        _last_commit_cache.pop(file_path, None)
 
 def ask_to_search_file(file_path):
     global stop_analysis
@@ -394,6 +1376,47 @@ def ask_to_search_file(file_path):
         print(Fore.RED + "Operación cancelada por el usuario.")
         sys.exit(1)
 
+@functools.lru_cache(maxsize=1)
+def remote_branch_names():
+    # Un solo `git for-each-ref` por ejecución; devuelve las ramas de remote_name
+    # sin el prefijo "<remote>/" y sin el alias simbólico HEAD
+    refs = run(["git", "for-each-ref", "--format=%(refname:strip=3)", f"refs/remotes/{remote_name}/"], allow_fail=True)
+    return tuple(branch for branch in refs.splitlines() if branch and branch != "HEAD")
+
+def batch_check_oids(specs):
+    # Oid de cada objeto de `specs` (None si no existe) con un solo
+    # `git cat-file --batch-check`
+    if not specs:
+        return []
+    # Un salto de línea rompería el protocolo; esas consultas no existen
+    query = "".join(f"{spec}\n" for spec in specs if "\n" not in spec)
+    try:
+        result = subprocess.run(
+            ["git", "cat-file", "--batch-check=%(objectname)"],
+            input=query, capture_output=True, text=True, env=GIT_ENV
+        )
+        lines = iter(result.stdout.splitlines())
+    except Exception as e:
+        log_message(f"Error consultando objetos con git cat-file: {str(e)}", "ERROR")
+        lines = iter(())
+    oids = []
+    for spec in specs:
+        line = next(lines, "") if "\n" not in spec else ""
+        # Los objetos inexistentes se informan como "<spec> missing"
+        oids.append(line if line and " " not in line else None)
+    return oids
+
+@functools.lru_cache(maxsize=32)
+def tree_path_names(commit_oid):
+    # Rutas del árbol de un commit; la clave es el oid, que no cambia, así que
+    # cada árbol se lista una sola vez aunque se busquen varios archivos
+    names = run(["git", "ls-tree", "-r", "-z", "--name-only", commit_oid], allow_fail=True)
+    return tuple(name for name in names.split("\0") if name)
+
+def tree_contains_path_fragment(commit_oid, file_path):
+    # Equivalente a `git ls-tree -r <commit> --name-only | grep -F file_path`
+    return any(file_path in name for name in tree_path_names(commit_oid))
+
 def search_file_in_remote(file_path):
     if not remote_name:
         return None
@@ -402,83 +1425,220 @@ def search_file_in_remote(file_path):
 
     try:
 
+        # Las ramas principales se revisan primero
         main_branches = ["master", "main", "develop", "dev"]
-        for branch in main_branches:
-            ref = f"{remote_name}/{branch}"
-            exists = run(f"git rev-parse --verify {ref} 2>/dev/null")
-            if exists:
-                result = run(f"git ls-tree -r {ref} --name-only | grep -F '{file_path}'")
-                if result:
-                    print(Fore.GREEN + f"Archivo encontrado en {ref}")
-                    commit = run(f"git log -n 1 --pretty=format:'%H' {ref} -- {file_path}")
-                    return commit
-
-        remote_branches = run(f"git branch -r | grep {remote_name}/ | sed 's/{remote_name}\\///'").splitlines()
-        for branch in remote_branches:
-            if branch in main_branches:
-                continue  
-
-            ref = f"{remote_name}/{branch}"
-            result = run(f"git ls-tree -r {ref} --name-only | grep -F '{file_path}'")
-            if result:
-                print(Fore.GREEN + f"Archivo encontrado en {ref}")
-                commit = run(f"git log -n 1 --pretty=format:'%H' {ref} -- {file_path}")
-                return commit
+        remote_branches = remote_branch_names()
+        existing = set(remote_branches)
+        ordered_branches = [b for b in main_branches if b in existing]
+        ordered_branches += [b for b in remote_branches if b not in main_branches]
+
+        refs = [f"{remote_name}/{branch}" for branch in ordered_branches]
+
+        # Un único `git cat-file --batch-check` da, para cada rama, el oid de
+        # su último commit y si contiene la ruta exacta
+        specs = []
+        for ref in refs:
+            specs.append(f"{ref}^{{commit}}")
+            specs.append(f"{ref}:{file_path}")
+        oids = batch_check_oids(specs)
+        tips = oids[0::2]
+        found = next((ref for ref, oid in zip(refs, oids[1::2]) if oid), None)
+
+        if found is None:
+            # La ruta puede ser solo un fragmento: se lista el árbol de cada
+            # rama, pero una sola vez por commit distinto
+            checked = set()
+            for ref, tip in zip(refs, tips):
+                if tip is None or tip in checked:
+                    continue
+                checked.add(tip)
+                if tree_contains_path_fragment(tip, file_path):
+                    found = ref
+                    break
+
+        if found:
+            print(Fore.GREEN + f"Archivo encontrado en {found}")
+            commit = run(["git", "log", "-n", "1", "--pretty=format:%H", found, "--", file_path])
+            return commit
     except Exception as e:
         log_message(f"Error al buscar en remote: {str(e)}", "ERROR")
 
     return None
 
+def iter_log_hashes(*args):
+    # `git log -z` separa los commits con NUL; la salida se lee por bloques
+    # para no construir la cadena completa y poder cortar la lectura antes
+    cmd = ["git", "log", "-z", "--pretty=format:%H", *args]
+    if verbose_mode:
+        log_message(f"Ejecutando: {shlex.join(cmd)}", "DEBUG")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=GIT_ENV)
+    pending = b""
+    try:
+        for chunk in iter(lambda: proc.stdout.read(65536), b""):
+            records = (pending + chunk).split(b"\x00")
+            pending = records.pop()
+            for record in records:
+                if record:
+                    yield record.decode()
+        if pending:
+            yield pending.decode()
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+def last_log_hash(*args):
+    # Solo interesa el commit más antiguo: se conserva únicamente el último
+    last = collections.deque(iter_log_hashes(*args), maxlen=1)
+    return last[0] if last else None
+
 def find_commit_adding_file(file_path):
+    # Los commits que agregan un archivo no cambian entre ejecuciones, por lo que
+    # se guardan también en disco (ADDING_COMMIT_CACHE)
+    cache_key = f"{remote_name or ''}:{file_path}"
+    if cache_key in adding_commit_cache:
+        return adding_commit_cache[cache_key]
+
+    result = _find_commit_adding_file(file_path)
+    if result:
+        adding_commit_cache[cache_key] = result
+    return result
+
+def _find_commit_adding_file(file_path):
     if remote_name:
-        run(f"git fetch {remote_name}")
-        result = run(f"git log --diff-filter=A --format='%H' {remote_name} -- {file_path}")
+        ensure_remote_fetched(allow_fail=False)
+        result = last_log_hash("--diff-filter=A", remote_name, "--", file_path)
         if result:
-            commits = result.splitlines()
-            if commits:
-                return commits[-1]
-        result = run(f"git log --full-history --format='%H' {remote_name} -- {file_path} | tail -1")
+            return result
+        result = last_log_hash("--full-history", remote_name, "--", file_path)
+        if result:
+            return result
+        # Todas las ramas del remote en un único recorrido, en lugar de un
+        # git log por cada referencia
+        result = last_log_hash("--diff-filter=A", f"--remotes={remote_name}", "--", file_path)
         if result:
             return result
-        remote_refs = run(f"git for-each-ref --format='%(refname:short)' refs/remotes/{remote_name}").splitlines()
-        for ref in remote_refs:
-            result = run(f"git log --diff-filter=A --format='%H' {ref} -- {file_path}")
-            if result:
-                commits = result.splitlines()
-                if commits:
-                    return commits[-1]
-    result = run(f"git log --diff-filter=A --format='%H' -- {file_path}")
+    result = last_log_hash("--diff-filter=A", "--", file_path)
     if result:
-        commits = result.splitlines()
-        if commits:
-            return commits[-1]
-    result = run(f"git log --full-history --format='%H' -- {file_path} | tail -1")
+        return result
+    result = last_log_hash("--full-history", "--", file_path)
     if result:
         return result
+    # Un solo recorrido tipo `git log -S` (con pygit2 si está disponible) en
+    # lugar de un `git grep` por cada commit del historial
     basename = os.path.basename(file_path)
-    search_cmd = f"git rev-list --all"
-    if remote_name:
-        search_cmd += f" {remote_name}"
-    result = run(f"{search_cmd} | xargs -I{{}} git grep -l '{basename}' {{}} | head -1")
+    result = None
+    if pygit2 is not None:
+        try:
+            result = pickaxe_search_in_process(basename)
+        except (pygit2.GitError, KeyError, ValueError) as e:
+            log_message(f"Búsqueda con pygit2 falló, se usa git log: {str(e)}", "DEBUG")
+            result = False
+    if pygit2 is None or result is False:
+        search_cmd = ["git", "log", "--all", f"-S{basename}", "--pretty=format:%H", "-n", "1"]
+        if remote_name:
+            search_cmd.append(remote_name)
+        result = run(search_cmd, allow_fail=True)
     if result:
-        file_commit = run(f"git log -n 1 --pretty=format:'%H' {result}")
-        if file_commit:
-            return file_commit
+        return result
     similar_files = find_similar_files(file_path)
     for similar, score in similar_files:
-        result = run(f"git log --diff-filter=A --format='%H' -- {similar} | tail -1")
+        result = last_log_hash("--diff-filter=A", "--", similar)
         if result:
             return result
     if remote_name:
         return search_file_in_remote(file_path)
     return None
 
+@functools.lru_cache(maxsize=1)
+def pygit2_repository():
+    return pygit2.Repository(".")
+
+def pickaxe_search_in_process(text):
+    # Equivalente a `git log --all -S<text> -n 1` recorriendo el ODB con
+    # pygit2: el commit más reciente cuyo diff cambia el número de apariciones
+    # de `text`. Como en git log, los merges no se inspeccionan
+    repo = pygit2_repository()
+    needle = text.encode("utf-8", "surrogateescape")
+    zero_oid = pygit2.Oid(raw=bytes(20))
+    walker = None
+    for ref_name in repo.references:
+        try:
+            commit = repo.references[ref_name].peel(pygit2.Commit)
+        except (pygit2.GitError, ValueError, KeyError):
+            continue
+        if walker is None:
+            walker = repo.walk(commit.id, pygit2.GIT_SORT_TIME)
+        else:
+            walker.push(commit.id)
+    if walker is None:
+        return None
+
+    def occurrences(oid):
+        if oid == zero_oid:
+            return 0
+        return repo[oid].data.count(needle)
+
+    for commit in walker:
+        if len(commit.parents) > 1:
+            continue
+        if commit.parents:
+            diff = repo.diff(commit.parents[0].tree, commit.tree)
+        else:
+            diff = commit.tree.diff_to_tree(swap=True)
+        for delta in diff.deltas:
+            if occurrences(delta.old_file.id) != occurrences(delta.new_file.id):
+                return str(commit.id)
+    return None
+
+# Ruta antigua -> ruta actual según los renombres registrados en el historial
+# de HEAD (None si no hay ninguno); HEAD solo avanza, así que un renombre
+# encontrado sigue siendo válido
+_recorded_renames = {}
+
+def find_recorded_rename(file_path):
+    # Sigue el archivo a través de los commits que lo eliminaron: la detección
+    # de renombres se hace solo sobre el diff de cada uno de esos commits, en
+    # lugar de comparar el nombre con todos los archivos del repositorio
+    if file_path in _recorded_renames:
+        return _recorded_renames[file_path]
+    path = file_path
+    seen = {path}
+    result = None
+    while len(seen) <= 10:
+        deleting = next(iter_log_hashes("--diff-filter=D", "HEAD", "--", path), None)
+        if not deleting:
+            break
+        fields = iter(run(
+            ["git", "diff-tree", "-r", "-z", "--name-status", "-M50", "--no-commit-id", deleting],
+            allow_fail=True
+        ).split("\0"))
+        new_path = None
+        for status in fields:
+            if not status:
+                continue
+            old = next(fields, "")
+            if status[0] == "R":
+                renamed = next(fields, "")
+                if old == path:
+                    new_path = renamed
+                    break
+        if not new_path or new_path in seen:
+            break
+        if new_path in tracked_files_set():
+            result = new_path
+            break
+        path = new_path
+        seen.add(path)
+    _recorded_renames[file_path] = result
+    return result
+
+# Resultados de find_similar_files por ruta buscada. Dependen de los archivos
+# versionados, así que se vacía junto con sus cachés en invalidate_tracked_files
+similar_files_cache = {}
+
 def find_similar_files(file_path):
-    # Caché para evitar búsquedas repetidas
-    global similar_files_cache
-    if 'similar_files_cache' not in globals():
-        similar_files_cache = {}
-    
     # Si ya buscamos este archivo antes, retornamos resultados en caché
     if file_path in similar_files_cache:
         return similar_files_cache[file_path]
@@ -486,24 +1646,81 @@ def find_similar_files(file_path):
     basename = os.path.basename(file_path)
     dirname = os.path.dirname(file_path)
 
-    all_files = run("git ls-files").splitlines()
+    # Un renombre registrado por git es la mejor coincidencia posible
+    recorded = find_recorded_rename(file_path)
+    if recorded:
+        similar_files_cache[file_path] = [(recorded, 100)]
+        return similar_files_cache[file_path]
+
+    all_files = all_tracked_files()
+    all_basenames = tracked_basenames()
+    by_stem, by_length = tracked_name_index()
     similar_files = []
 
     # Si el nombre de archivo tiene extensión, buscar también sin extensión
     filebase, ext = os.path.splitext(basename)
     if ext:
         # Buscar archivos similares que podrían tener otra extensión
-        for repo_file in all_files:
-            repo_filebase, repo_ext = os.path.splitext(os.path.basename(repo_file))
-            if filebase == repo_filebase and ext != repo_ext:
-                similar_files.append((repo_file, 90))  # Alta similitud para mismo nombre con extensión diferente
-    
+        for idx in by_stem.get(filebase, ()):
+            if os.path.splitext(all_basenames[idx])[1] != ext:
+                similar_files.append((all_files[idx], 90))  # Alta similitud para mismo nombre con extensión diferente
+
+    # Si el mismo nombre existe en otro directorio se devuelven solo esas
+    # coincidencias exactas (y las de otra extensión) sin calcular distancias.
+    # Un nombre parecido en el mismo directorio podía puntuar hasta 130 y
+    # quedar por delante; ahora la coincidencia exacta gana siempre
+    exact_idx = [idx for idx in by_stem.get(filebase, ()) if all_basenames[idx] == basename]
+    if exact_idx:
+        for idx in exact_idx:
+            repo_dirname = os.path.dirname(all_files[idx])
+            score = 100
+            if dirname == repo_dirname:
+                score += 20
+            if calculate_similarity(dirname, repo_dirname) > 70:
+                score += 10
+            similar_files.append((all_files[idx], score))
+        similar_files.sort(key=lambda x: x[1], reverse=True)
+        similar_files_cache[file_path] = similar_files[:5]
+        return similar_files_cache[file_path]
+
+    # La distancia de edición es al menos la diferencia de longitudes, así que
+    # la similitud nunca supera len(corto)/len(largo); con las bonificaciones
+    # (+30 como máximo) eso permite descartar grupos enteros de nombres por su
+    # longitud sin calcular ninguna distancia
+    target_len = len(basename)
+    min_name_similarity = config["rename_detection_threshold"] - 30 - 1
+    candidate_idx = []
+    for length, indices in by_length.items():
+        shorter, longer = sorted((target_len, length))
+        if not longer or (shorter / longer) * 100 >= min_name_similarity:
+            candidate_idx.extend(indices)
+    candidate_idx.sort()
+
+    # Con rapidfuzz se descartan de una vez los nombres que ni sumando las
+    # bonificaciones por directorio (+30) llegarían al umbral, y la puntuación
+    # que devuelve se reutiliza en lugar de volver a calcularla
+    name_scores = None
+    if rf_process is not None:
+        cutoff = max(0, config["rename_detection_threshold"] - 30.5) / 100
+        matches = rf_process.extract(
+            basename,
+            [all_basenames[idx] for idx in candidate_idx],
+            scorer=rf_levenshtein.normalized_similarity,
+            score_cutoff=cutoff,
+            limit=None
+        )
+        name_scores = {candidate_idx[pos]: round(score * 100) for _, score, pos in matches}
+        candidate_idx = sorted(name_scores)
+
     # Buscar por similitud de nombres
-    for repo_file in all_files:
-        repo_basename = os.path.basename(repo_file)
+    for idx in candidate_idx:
+        repo_file = all_files[idx]
         repo_dirname = os.path.dirname(repo_file)
 
-        name_similarity = calculate_similarity(basename, repo_basename)
+        if name_scores is not None:
+            name_similarity = name_scores[idx]
+        else:
+            name_similarity = calculate_similarity(basename, all_basenames[idx])
 
         if dirname == repo_dirname:
             name_similarity += 20  # Bonus por estar en el mismo directorio
@@ -519,10 +1736,10 @@ def find_similar_files(file_path):
     # Si no encontramos archivos similares, intentar búsqueda más exhaustiva
     if len(similar_files) == 0 and len(filebase) > 3:
         # Buscar archivos con nombres parciales (útil para renombres mayores)
-        for repo_file in all_files:
-            repo_basename = os.path.basename(repo_file)
-            if len(filebase) > 5 and (filebase[:5] in repo_basename or filebase[-5:] in repo_basename):
-                similar_files.append((repo_file, 60))  # Similitud media para coincidencias parciales
+        if len(filebase) > 5:
+            matches = tracked_basenames_containing(filebase[:5]) | tracked_basenames_containing(filebase[-5:])
+            for idx in sorted(matches):
+                similar_files.append((all_files[idx], 60))  # Similitud media para coincidencias parciales
     
     # Ordenar por similaridad y limitar resultados
     similar_files.sort(key=lambda x: x[1], reverse=True)
@@ -532,26 +1749,36 @@ def find_similar_files(file_path):
     similar_files_cache[file_path] = results
     return results
 
+# find_similar_files compara el directorio buscado con el de cada candidato y
+# muchos archivos comparten directorio: los pares repetidos salen de la caché
+@functools.lru_cache(maxsize=65536)
 def calculate_similarity(str1, str2):
     if not str1 or not str2:
         return 0
 
+    if rf_levenshtein is not None:
+        return round(rf_levenshtein.normalized_similarity(str1, str2) * 100)
+
     m, n = len(str1), len(str2)
     if m < n:
-        return calculate_similarity(str2, str1)
-
-    if n == 0:
-        return 0
+        str1, str2 = str2, str1
+        m, n = n, m
 
-    prev_row = range(n + 1)
+    # Dos filas preasignadas que se intercambian en cada iteración
+    prev_row = list(range(n + 1))
+    curr_row = [0] * (n + 1)
     for i, c1 in enumerate(str1):
-        curr_row = [i + 1]
+        curr_row[0] = left = i + 1
         for j, c2 in enumerate(str2):
-            insertions = prev_row[j + 1] + 1
-            deletions = curr_row[j] + 1
-            substitutions = prev_row[j] + (c1 != c2)
-            curr_row.append(min(insertions, deletions, substitutions))
-        prev_row = curr_row
+            diag = prev_row[j] + (c1 != c2)
+            up = prev_row[j + 1] + 1
+            left += 1
+            if up < left:
+                left = up
+            if diag < left:
+                left = diag
+            curr_row[j + 1] = left
+        prev_row, curr_row = curr_row, prev_row
 
     distance = prev_row[n]
     max_len = max(m, n)
@@ -559,28 +1786,22 @@ def calculate_similarity(str1, str2):
     return round(similarity)
 
 def find_commit_history_chain(file_path, target_commit):
-    remote_ref = f"{remote_name}/" if remote_name else ""
     creation_commit = find_commit_adding_file(file_path)
     if not creation_commit:
         return []
     try:
-        target_ref = target_commit
-        creation_ref = creation_commit
-        if remote_name:
-            remote_target = f"{remote_name}/{target_commit}"
-            if run(f"git rev-parse --verify {remote_target}^{{commit}} 2>/dev/null", allow_fail=True):
-                target_ref = remote_target
-            remote_creation = f"{remote_name}/{creation_commit}"
-            if run(f"git rev-parse --verify {remote_creation}^{{commit}} 2>/dev/null", allow_fail=True):
-                creation_ref = remote_creation
+        target_ref = resolve_commit_ref(target_commit) if target_commit else target_commit
+        creation_ref = resolve_commit_ref(creation_commit)
         if target_commit:
-            result = run(f"git log --format='%H' {creation_ref}~1..{target_ref} -- {file_path}", allow_fail=True)
-            if result:
-                commits = result.splitlines()
+            commits = list(iter_log_hashes(f"{creation_ref}~1..{target_ref}", "--", file_path))
+            if commits:
                 if creation_commit not in commits:
                     commits = [creation_commit] + commits
                 return commits
-        all_commits = run(f"git log --format='%H' --follow {remote_ref} -- {file_path}", allow_fail=True).splitlines()
+        if remote_name:
+            all_commits = list(iter_log_hashes("--follow", remote_name, "--", file_path))
+        else:
+            all_commits = list(iter_log_hashes("--follow", "--", file_path))
         if not all_commits:
             return [creation_commit]
         return all_commits
@@ -588,29 +1809,104 @@ def find_commit_history_chain(file_path, target_commit):
         return [creation_commit]
 
 def find_file_history(file_path):
-    cmd = f"git log --name-status --follow --format='%H %cr: %s' -- {file_path}"
+    cmd = ["git", "log", "--name-status", "--follow", "--format=%H %cr: %s", "--", file_path]
     if remote_name:
-        cmd = f"git log --name-status --follow --format='%H %cr: %s' {remote_name} -- {file_path}"
+        cmd = ["git", "log", "--name-status", "--follow", "--format=%H %cr: %s", remote_name, "--", file_path]
 
     return run(cmd)
 
+# Pool compartido para las búsquedas `git log -S`: el análisis de varios
+# archivos ya corre en paralelo, así que el total de procesos git queda
+# limitado por analysis_workers en lugar de multiplicarse por archivo
+_symbol_executor = None
+_symbol_executor_lock = threading.Lock()
+
+def get_symbol_executor():
+    global _symbol_executor
+    with _symbol_executor_lock:
+        if _symbol_executor is None:
+            _symbol_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, config["analysis_workers"])
+            )
+        return _symbol_executor
+
+# Tope de búsquedas `git log -S` por archivo: se conservan los símbolos menos
+# frecuentes en el archivo, que son los más específicos; los comunes suelen
+# devolver commits que el blame ya aporta
+MAX_PICKAXE_QUERIES = 64
+
+def select_pickaxe_symbols(symbols, code):
+    symbols = [s for s in symbols if not (s.startswith("__") and s.endswith("__"))]
+    if len(symbols) <= MAX_PICKAXE_QUERIES:
+        return symbols
+    counts = collections.Counter(IDENTIFIER_RE.findall(code))
+    return heapq.nsmallest(MAX_PICKAXE_QUERIES, symbols, key=lambda s: (counts[s], s))
+
+@functools.lru_cache(maxsize=None)
+def find_commits_changing_symbol(symbol, file):
+    # El resultado de `git log -S` depende solo del símbolo y del archivo, no
+    # del commit analizado: se consulta una única vez por par en la ejecución
+    if remote_name:
+        return tuple(iter_log_hashes(f"-S{symbol}", remote_name, "--", file))
+    return tuple(iter_log_hashes(f"-S{symbol}", "--", file))
+
+# Último oid con el que se hizo blame de cada archivo en esta ejecución
+_blame_latest = {}
+
+def get_blame_commits(file):
+    # El blame se hace sobre HEAD (o el remote), no sobre el commit analizado:
+    # se guarda por oid de esa referencia y se reutiliza entre commits
+    ref = remote_name or "HEAD"
+    head = git_object_oid(f"{ref}^{{commit}}")
+    key = f"{head}:{file}"
+    commits = blame_cache.get(key) if head else None
+    if commits is None and head:
+        commits = _reuse_previous_blame(file, head)
+    if commits is None:
+        try:
+            blame_cmd = ["git", "blame", "--incremental", "--", file]
+            if remote_name:
+                blame_cmd = ["git", "blame", "--incremental", remote_name, "--", file]
+
+            blame_output = run(blame_cmd)
+        except Exception:
+            blame_output = ""
+        commits = sorted(set(BLAME_HEADER_RE.findall(blame_output))) if blame_output else []
+    if head:
+        blame_cache[key] = commits
+        _blame_latest[file] = head
+    return set(commits)
+
+def _reuse_previous_blame(file, head):
+    # Si la referencia avanzó sin tocar el archivo (mismo blob y el oid anterior
+    # es ancestro), el blame es idéntico al ya calculado
+    previous = _blame_latest.get(file)
+    if previous is None or previous == head:
+        return None
+    previous_blob = git_object_oid(f"{previous}:{file}")
+    if previous_blob is None or previous_blob != git_object_oid(f"{head}:{file}"):
+        return None
+    result = subprocess.run(["git", "merge-base", "--is-ancestor", previous, head], capture_output=True, env=GIT_ENV)
+    if result.returncode != 0:
+        return None
+    return blame_cache.get(f"{previous}:{file}")
+
 def get_blame_and_grep_dependencies(commit, file, dep_cache=None):
     # Usar caché para evitar análisis repetitivos
     cache_key = f"{commit}:{file}"
     if dep_cache is not None and cache_key in dep_cache:
         return dep_cache[cache_key]
+    base = dep_cache_base()
 
     remote_ref = f"{remote_name}/" if remote_name else ""
     commit_ref = f"{remote_ref}{commit}" if remote_name else commit
 
     # Obtener el contenido del archivo
-    try:
-        file_content = run(f"git show {commit}:{file}")
-    except Exception:
+    content = git_show(commit, file)
+    if not content:
         return []
 
-    if not file_content:
-        return []
+    file_content = content.decode("utf-8", errors="replace")
 
     lines = file_content.splitlines()
     
@@ -619,130 +1915,45 @@ def get_blame_and_grep_dependencies(commit, file, dep_cache=None):
     extension = extension.lower()
     
     # Analizar el blame para identificar commits que modificaron el archivo
-    try:
-        blame_cmd = f"git blame --porcelain {file}"
-        if remote_name:
-            blame_cmd = f"git blame --porcelain {remote_name} {file}"
-
-        blame_output = run(blame_cmd)
-    except Exception:
-        blame_output = ""
-
-    blame_commits = set()
-    if blame_output:
-        for line in blame_output.splitlines():
-            if line and len(line.split()) >= 1 and len(line.split()[0]) == 40:  # 40 caracteres = hash SHA-1
-                blame_commits.add(line.split()[0])
+    blame_commits = get_blame_commits(file)
 
     # Iniciar la lista de commits sospechosos con los del blame
     suspects = set(blame_commits)
     
-    # Análisis específico por tipo de archivo/lenguaje
-    language_patterns = {
-        ".py": {
-            "imports": [
-                r'import\s+([a-zA-Z0-9_.]+)',
-                r'from\s+([a-zA-Z0-9_.]+)\s+import',
-            ],
-            "functions": [
-                r'def\s+([a-zA-Z0-9_]+)\s*\(',
-                r'([a-zA-Z0-9_]+)\s*\('
-            ]
-        },
-        ".js": {
-            "imports": [
-                r'import\s+.*\s+from\s+[\'"]([^\'"]+)[\'"]',
-                r'require\s*\(\s*[\'"]([^\'"]+)[\'"]\s*\)',
-            ],
-            "functions": [
-                r'function\s+([a-zA-Z0-9_]+)\s*\(',
-                r'const\s+([a-zA-Z0-9_]+)\s*=\s*\(',
-                r'let\s+([a-zA-Z0-9_]+)\s*=\s*\(',
-                r'var\s+([a-zA-Z0-9_]+)\s*=\s*\(',
-                r'([a-zA-Z0-9_]+)\s*:\s*function'
-            ]
-        },
-        ".c": {
-            "imports": [
-                r'#\s*include\s*[<"]([^>"]+)[>"]',
-            ],
-            "functions": [
-                r'([a-zA-Z0-9_]+)\s*\(',
-                r'typedef\s+struct\s+([a-zA-Z0-9_]+)'
-            ]
-        },
-        ".cpp": {
-            "imports": [
-                r'#\s*include\s*[<"]([^>"]+)[>"]',
-            ],
-            "functions": [
-                r'([a-zA-Z0-9_:]+)::[a-zA-Z0-9_]+\s*\(',
-                r'([a-zA-Z0-9_]+)\s*\(',
-                r'class\s+([a-zA-Z0-9_]+)'
-            ]
-        },
-        ".h": {
-            "imports": [
-                r'#\s*include\s*[<"]([^>"]+)[>"]',
-            ],
-            "functions": [
-                r'([a-zA-Z0-9_]+)\s*\(',
-                r'typedef\s+struct\s+([a-zA-Z0-9_]+)',
-                r'class\s+([a-zA-Z0-9_]+)'
-            ]
-        },
-        ".java": {
-            "imports": [
-                r'import\s+([a-zA-Z0-9_.]+)',
-            ],
-            "functions": [
-                r'([a-zA-Z0-9_]+)\s*\(',
-                r'class\s+([a-zA-Z0-9_]+)',
-                r'interface\s+([a-zA-Z0-9_]+)'
-            ]
-        }
-    }
-    
-    # Si no hay un patrón específico para la extensión, usar uno genérico
-    if extension not in language_patterns:
-        patterns = {
-            "functions": [r'([a-zA-Z0-9_]+)\s*\(']
-        }
-    else:
-        patterns = language_patterns[extension]
+    # Análisis específico por tipo de archivo/lenguaje; si no hay un patrón
+    # específico para la extensión, usar uno genérico
+    patterns = LANGUAGE_PATTERNS.get(extension, GENERIC_PATTERNS)
     
-    # Extraer funciones y símbolos importantes
+    # Extraer funciones y símbolos importantes. Las líneas vacías y de
+    # comentario se descartan antes; cada patrón recorre después el texto
+    # restante de una vez, en lugar de una llamada por línea y patrón. Los
+    # patrones no aceptan "\n" (ver _line_regex), así que los símbolos son los
+    # mismos que línea a línea
+    code = "\n".join(
+        line for line in (l.strip() for l in lines)
+        if line and not line.startswith(("//", "#"))
+    )
     important_symbols = set()
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Ignorar líneas vacías o comentarios
-        if not line or line.startswith("//") or line.startswith("#"):
-            continue
-            
-        # Buscar símbolos y funciones según el tipo de archivo
-        for pattern_type, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                matches = re.findall(pattern, line)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        match = match[0]  # En caso de que el regex devuelva grupos
-                    if match and len(match) > 1:  # Ignore symbols that are too short
-                        important_symbols.add(match)
+    for pattern_list in patterns.values():
+        for pattern in pattern_list:
+            for match in pattern.findall(code):
+                if isinstance(match, tuple):
+                    match = match[0]  # En caso de que el regex devuelva grupos
+                if match and len(match) > 1:  # Ignore symbols that are too short
+                    important_symbols.add(match)
     
-    # Buscar commits asociados a los símbolos importantes
-    for symbol in important_symbols:
-        # Buscar sólo símbolos significativos
-        if len(symbol) < 3 or not symbol.isidentifier():
-            continue
-            
-        grep_cmd = f"git log -S'{symbol}' --pretty=format:'%H' -- {file}"
-        if remote_name:
-            grep_cmd = f"git log -S'{symbol}' --pretty=format:'%H' {remote_name} -- {file}"
-
-        grep_result = run(grep_cmd)
-        if grep_result:
-            suspects.update(grep_result.splitlines())
+    # Buscar commits asociados a los símbolos importantes (sólo los
+    # significativos y, como mucho, MAX_PICKAXE_QUERIES de ellos); cada
+    # búsqueda es independiente y se lanzan en paralelo
+    symbols = [s for s in important_symbols if len(s) >= 3 and s.isidentifier()]
+    symbols = select_pickaxe_symbols(symbols, code)
+    if len(symbols) > 1:
+        executor = get_symbol_executor()
+        for commits in executor.map(find_commits_changing_symbol, symbols, itertools.repeat(file)):
+            suspects.update(commits)
+    else:
+        for symbol in symbols:
+            suspects.update(find_commits_changing_symbol(symbol, file))
     
     # Analizar dependencias de archivos incluidos
     includes = extract_includes(file_content)
@@ -755,9 +1966,9 @@ def get_blame_and_grep_dependencies(commit, file, dep_cache=None):
             pass
 
     # Verificar si hay rename_dependencies especiales (para refactors)
-    rename_grep_cmd = f"git log --name-status --format='%H' -M -C -- {file}"
+    rename_grep_cmd = ["git", "log", "--name-status", "--format=%H", "-M", "-C", "--", file]
     if remote_name:
-        rename_grep_cmd = f"git log --name-status --format='%H' -M -C {remote_name} -- {file}"
+        rename_grep_cmd = ["git", "log", "--name-status", "--format=%H", "-M", "-C", remote_name, "--", file]
     
     rename_output = run(rename_grep_cmd)
     if rename_output:
@@ -772,104 +1983,241 @@ def get_blame_and_grep_dependencies(commit, file, dep_cache=None):
     # Convertir a lista para almacenar en caché
     suspects_list = list(suspects)
     if dep_cache is not None:
-        dep_cache[cache_key] = suspects_list
+        store_dep_entry(dep_cache, cache_key, suspects_list, base)
     return suspects_list
 
 def extract_includes(file_content):
     includes = []
 
-    patterns = [
-        r'#\s*include\s*[<"]([^>"]+)[>"]',  
-        r'import\s+[\'"]([^\'"]+)[\'"]',    
-        r'from\s+[\'"]([^\'"]+)[\'"]',      
-        r'require\s*\(\s*[\'"]([^\'"]+)[\'"]\s*\)',  
-        r'@import\s+[\'"]([^\'"]+)[\'"]',   
-        r'<link[^>]+href=[\'"]([^\'"]+)[\'"]',  
-    ]
-
-    for pattern in patterns:
-        matches = re.findall(pattern, file_content)
-        for match in matches:
+    for match in INCLUDE_RE.finditer(file_content):
 
-            path = match.strip()
-            if not path.endswith(('.h', '.c', '.cpp', '.hpp', '.py', '.js', '.css')):
+        path = match.group(match.lastindex).strip()
+        if not path.endswith(('.h', '.c', '.cpp', '.hpp', '.py', '.js', '.css')):
 
-                if '.' not in os.path.basename(path):
-                    for ext in ['.h', '.py', '.js']:
-                        potential_path = path + ext
+            if '.' not in os.path.basename(path):
+                for ext in ['.h', '.py', '.js']:
+                    potential_path = path + ext
 
-                        if run(f"git ls-files | grep -F '{potential_path}'"):
-                            path = potential_path
-                            break
+                    if is_tracked_path_fragment(potential_path):
+                        path = potential_path
+                        break
 
-            includes.append(path)
+        includes.append(path)
 
     return includes
 
+COMMIT_CONTEXT_FORMAT = "%h%x1f%an%x1f%ae%x1f%s%x1f%cd"
+
+# Contextos leídos por lotes en prefetch_commit_contexts (o uno a uno en
+# get_commit_context), consultados antes de lanzar un `git log` por commit
+_prefetched_contexts = {}
+
+def format_commit_context(metadata):
+    commit_hash, commit_author, commit_email, commit_subject, commit_date = metadata.split("\x1f", 4)
+    return f"{commit_hash} ({commit_date}) - {commit_author} - {commit_subject}"
+
+@functools.lru_cache(maxsize=4096)
 def get_commit_context(commit):
+    context = _prefetched_contexts.get(commit)
+    if context is not None:
+        return context
+
     ref = commit
-    commit_found = False
+    log_cmd = ["git", "log", "-1", f"--pretty=format:{COMMIT_CONTEXT_FORMAT}", "--date=short", ref]
 
-    local_exists = run(f"git cat-file -e {commit}^{{commit}} 2>/dev/null", allow_fail=True)
-    if local_exists:
-        commit_found = True
+    # Si el commit ya existe localmente basta con una sola llamada a git log.
+    # Con remote se comprueba antes por el pipe de cat-file, para no lanzar un
+    # git log que va a fallar cuando el commit aún no se ha traído
+    metadata = ""
+    if not remote_name or commit_exists(commit):
+        metadata = run(log_cmd, allow_fail=True)
 
-    if not commit_found and remote_name:
+    if not metadata and remote_name:
+        commit_found = False
 
-        run(f"git fetch {remote_name}", allow_fail=False)
+        ensure_remote_fetched(allow_fail=False)
 
-        remote_branches = run(f"git branch -r --contains {commit} 2>/dev/null | grep {remote_name}/", allow_fail=True)
+        remote_branches = [
+            b.strip() for b in run(["git", "branch", "-r", "--contains", commit], allow_fail=True).splitlines()
+            if b.strip().startswith(f"{remote_name}/")
+        ]
         if remote_branches:
             commit_found = True
             if verbose_mode:
-                log_message(f"Commit {commit} encontrado en remoto: {remote_branches.splitlines()[0].strip()}", "INFO")
+                log_message(f"Commit {commit} encontrado en remoto: {remote_branches[0]}", "INFO")
         else:
 
-            run(f"git fetch {remote_name} {commit}", allow_fail=True)
+            ensure_remote_fetched(ref=commit)
 
-            commit_found = run(f"git cat-file -e {commit}^{{commit}} 2>/dev/null", allow_fail=True) != ""
+            commit_found = commit_exists(commit)
 
-    if not commit_found and verbose_mode:
-        log_message(f"Commit {commit} no encontrado localmente ni en referencia directa de remote {remote_name}", "WARNING")
+        if not commit_found and verbose_mode:
+            log_message(f"Commit {commit} no encontrado localmente ni en referencia directa de remote {remote_name}", "WARNING")
 
-    commit_hash = run(f"git log -1 --pretty=format:'%h' {ref}", allow_fail=True)
-    if not commit_hash:
+        metadata = run(log_cmd, allow_fail=True)
+
+    if not metadata:
         return f"{commit[:7]} (commit no encontrado)"
 
-    commit_author = run(f"git log -1 --pretty=format:'%an' {ref}")
-    commit_email = run(f"git log -1 --pretty=format:'%ae' {ref}")
-    commit_subject = run(f"git log -1 --pretty=format:'%s' {ref}")
-    commit_date = run(f"git log -1 --pretty=format:'%cd' --date=short {ref}")
+    # Los commits encontrados no cambian: la vista previa y el análisis
+    # posterior del mismo commit reutilizan el resultado
+    context = _prefetched_contexts[commit] = format_commit_context(metadata)
+    return context
+
+def read_local_commit_contexts(commits):
+    # Un único `git log --no-walk --stdin` para todos los commits que ya están
+    # en local; cada commit se identifica por su oid completo (%H)
+    oids = {}
+    for commit in commits:
+        oid = git_object_oid(f"{commit}^{{commit}}")
+        if oid:
+            oids.setdefault(oid, []).append(commit)
+    if not oids:
+        return {}
+    try:
+        result = subprocess.run(
+            ["git", "log", "--no-walk=unsorted", "--stdin",
+             f"--pretty=format:%H%x1f{COMMIT_CONTEXT_FORMAT}", "--date=short"],
+            input="".join(f"{oid}\n" for oid in oids), capture_output=True, text=True, env=GIT_ENV
+        )
+    except Exception as e:
+        log_message(f"Error leyendo el contexto de los commits: {str(e)}", "ERROR")
+        return {}
+    contexts = {}
+    for line in result.stdout.splitlines():
+        oid, _, metadata = line.partition("\x1f")
+        for commit in oids.get(oid, ()):
+            contexts[commit] = format_commit_context(metadata)
+    return contexts
+
+def prefetch_commit_contexts(commits):
+    # Los commits locales se leen con un solo git log; el resto (que puede
+    # necesitar un fetch) se resuelve en paralelo. Los listados posteriores
+    # salen de la caché de get_commit_context
+    commits = list(dict.fromkeys(commits))
+    if len(commits) < 2:
+        return
+    _prefetched_contexts.update(read_local_commit_contexts(commits))
+    commits = [c for c in commits if c not in _prefetched_contexts]
+    if not commits:
+        return
+    workers = min(len(commits), max(1, config["analysis_workers"]))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(get_commit_context, commits):
+            pass
 
-    return f"{commit_hash} ({commit_date}) - {commit_author} - {commit_subject}"
+def _prefetch_commit(commit):
+    try:
+        get_commit_files(commit)
+    except Exception as e:
+        log_message(f"Error precargando el commit {commit}: {str(e)}", "WARNING")
+
+def _prefetch_contexts(commits):
+    try:
+        prefetch_commit_contexts(commits)
+    except Exception as e:
+        log_message(f"Error precargando el contexto de los commits: {str(e)}", "WARNING")
+
+def start_commit_prefetch(commits, dep_cache, finished):
+    # El análisis pregunta al usuario y tiene que ser secuencial, pero los
+    # metadatos y la lista de archivos de cada commit no cambian: se cargan en
+    # segundo plano mientras se procesan los primeros commits
+    commits = list(dict.fromkeys(commits))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, config["analysis_workers"]))
+    executor.submit(_prefetch_contexts, commits)
+    for commit in commits:
+        executor.submit(_prefetch_commit, commit)
+    if dry_run:
+        # En modo simulación HEAD no cambia: el análisis de solo lectura de
+        # todos los commits ya es válido y se adelanta en paralelo
+        for commit in commits:
+            executor.submit(prefetch_commit_analysis, commit, dep_cache, finished)
+    return executor
 
 def add_commit_once(commit):
-    if commit not in final_commits:
-        final_commits.append(commit)
-    if commit not in cherry_pick_queue:
-        cherry_pick_queue.append(commit)
+    final_commits.setdefault(commit)
+    cherry_pick_queue.setdefault(commit)
+    pending_commits.add(commit)
 
 def count_unique_pending_commits():
-    unique_commits = set(final_commits + cherry_pick_queue)
-    if initial_commit and initial_commit not in unique_commits:
-        unique_commits.add(initial_commit)
-    return len(unique_commits)
+    if initial_commit and initial_commit not in pending_commits:
+        return len(pending_commits) + 1
+    return len(pending_commits)
+
+# La barra se redibuja como mucho cada PROGRESS_INTERVAL segundos; la primera
+# y la última actualización se muestran siempre
+PROGRESS_INTERVAL = 0.05
+_progress_drawn_at = 0.0
 
 def show_progress(current, total, message="Procesando"):
+    global _progress_drawn_at
     if not config["show_progress_bar"] or dry_run:
         return
 
+    now = time.monotonic()
+    if current != total and current > 1 and now - _progress_drawn_at < PROGRESS_INTERVAL:
+        return
+    _progress_drawn_at = now
+
     bar_length = 40
     progress = min(1.0, current / total if total > 0 else 1.0)
     filled_length = int(bar_length * progress)
     bar = '█' * filled_length + '░' * (bar_length - filled_length)
     percent = int(progress * 100)
 
-    print(f"\r{message}: [{bar}] {percent}% ({current}/{total})", end='')
-    if current == total:
-        print()
+    end = "\n" if current == total else ""
+    sys.stdout.write(f"\r{message}: [{bar}] {percent}% ({current}/{total}){end}")
+    sys.stdout.flush()
+
+def analyze_commit(commit, dep_cache):
+    # Recorrido con una cola de trabajo en lugar de recursión. Un commit se
+    # marca al encolarlo, así que nunca entra dos veces aunque aún no se haya
+    # analizado
+    work_queue = collections.deque([commit])
+    queued = {commit}
+
+    def enqueue(dep_commit):
+        if dep_commit not in queued:
+            queued.add(dep_commit)
+            work_queue.append(dep_commit)
+
+    # Mientras se analiza un commit (y se espera al usuario) se precarga en
+    # segundo plano el análisis del siguiente de la cola; `finished` corta la
+    # precarga en cuanto termina el recorrido
+    prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    finished = threading.Event()
+    try:
+        while work_queue and not stop_analysis:
+            current = work_queue.popleft()
+            if work_queue:
+                prefetcher.submit(prefetch_commit_analysis, work_queue[0], dep_cache, finished)
+            analyze_single_commit(current, dep_cache, enqueue, queued)
+    finally:
+        # Se espera a la precarga en curso (como mucho un archivo): después
+        # puede aplicarse un cherry-pick y sus consultas dependen de HEAD
+        finished.set()
+        prefetcher.shutdown(wait=True, cancel_futures=True)
+
+def prefetch_commit_analysis(commit, dep_cache, finished):
+    # Solo lecturas: la lista de archivos, el último commit de cada uno y sus
+    # dependencias quedan en caché para cuando el commit se analice. Los
+    # errores se repiten (y se informan) cuando el análisis lo pide de nuevo
+    if commit in analyzed_commits or commit in applied_commits:
+        return
+    try:
+        actual_files = [
+            file_renames.get(file, file) for file in get_commit_files(commit)
+        ]
+        actual_files = [f for f in dict.fromkeys(actual_files) if f not in created_files]
+        precompute_last_commits(actual_files)
+        for actual_file in actual_files:
+            if finished.is_set() or stop_analysis:
+                return
+            prefetch_file_analysis(commit, actual_file, dep_cache)
+    except Exception:
+        pass
 
-def analyze_commit(commit, dep_cache):
+def analyze_single_commit(commit, dep_cache, enqueue, queued):
     global stop_analysis, processed_missing_files, created_files
 
     if stop_analysis:
@@ -879,8 +2227,8 @@ def analyze_commit(commit, dep_cache):
         log_message(f"El commit {commit} ya fue analizado o aplicado.", "INFO")
         return
 
-    if commit not in final_commits:
-        final_commits.append(commit)
+    final_commits.setdefault(commit)
+    pending_commits.add(commit)
 
     analyzed_commits.add(commit)
     print(Fore.GREEN + f"\nAnalizando commit {commit}...")
@@ -888,13 +2236,47 @@ def analyze_commit(commit, dep_cache):
     files = get_commit_files(commit)
     total_files = len(files)
 
+    # Las consultas de git de cada archivo son independientes: se lanzan en
+    # paralelo y el bucle (que es el que pregunta al usuario) solo recoge resultados
+    precompute_last_commits({
+        file_renames.get(file, file) for file in files
+    } - created_files)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, config["analysis_workers"]))
+    prefetched = {}
+    for file in files:
+        actual_file = file_renames.get(file, file)
+        if actual_file not in created_files and actual_file not in prefetched:
+            prefetched[actual_file] = executor.submit(prefetch_file_analysis, commit, actual_file, dep_cache)
+
+    try:
+        analyze_commit_files(commit, files, dep_cache, prefetched, enqueue, queued)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def prefetch_file_analysis(commit, actual_file, dep_cache):
+    # Solo lecturas de git (sin interacción), seguras para ejecutarse en un hilo
+    try:
+        get_last_commit_affecting_file(actual_file)
+        get_blame_and_grep_dependencies(commit, actual_file, dep_cache)
+    except Exception as e:
+        log_message(f"Error precargando el análisis de {actual_file}: {str(e)}", "WARNING")
+
+def analyze_commit_files(commit, files, dep_cache, prefetched, enqueue, queued):
+    global stop_analysis
+
+    total_files = len(files)
+
     for idx, file in enumerate(files):
         show_progress(idx + 1, total_files, f"Analizando archivos de {commit[:8]}")
         actual_file = file_renames.get(file, file)
         if actual_file in created_files:
             continue
-        file_exists = run(f"git ls-files --error-unmatch {actual_file} 2>/dev/null || echo 'NOT_EXISTS'")
-        if file_exists == "NOT_EXISTS":
+        future = prefetched.get(actual_file)
+        if future is not None and not future.cancelled():
+            future.result()
+        file_exists = actual_file in tracked_files_set()
+        if not file_exists:
             file_commit_key = f"{file}:{commit}"
             if file_commit_key in processed_missing_files:
                 continue
@@ -946,28 +2328,26 @@ def analyze_commit(commit, dep_cache):
                 if option.startswith("Especificar"):
                     local_name = input(f"Archivo local para '{actual_file}': ").strip()
                     file_renames[actual_file] = local_name
-                    save_file_renames()
+                    mark_file_renames_dirty()
                 elif option.startswith("Cancelar"):
                     stop_analysis = True
                     return
         last_commit = get_last_commit_affecting_file(actual_file)
-        if last_commit and last_commit != commit and last_commit not in analyzed_commits and last_commit not in applied_commits:
+        if last_commit and last_commit != commit and last_commit not in queued and last_commit not in analyzed_commits and last_commit not in applied_commits:
             option = select_option([
                 f"Agregar commit faltante a la lista de commits a aplicar {last_commit}",
                 f"Continuar con el cherry-pick ({count_unique_pending_commits()})"
             ])
             if option.startswith("Agregar"):
                 add_commit_once(last_commit)
-                analyze_commit(last_commit, dep_cache)
-                if stop_analysis:
-                    return
+                enqueue(last_commit)
             elif option.startswith("Continuar"):
                 stop_analysis = True
                 return
         if stop_analysis:
             return
         dependencies = get_blame_and_grep_dependencies(commit, actual_file, dep_cache)
-        relevant_deps = [dep for dep in dependencies if dep not in analyzed_commits and dep not in applied_commits and dep != commit]
+        relevant_deps = [dep for dep in dependencies if dep not in queued and dep not in analyzed_commits and dep not in applied_commits and dep != commit]
         for dep_commit in relevant_deps:
             if config["auto_add_dependencies"]:
                 add_commit_once(dep_commit)
@@ -978,23 +2358,33 @@ def analyze_commit(commit, dep_cache):
             ])
             if choice.startswith("Agregar"):
                 add_commit_once(dep_commit)
-                analyze_commit(dep_commit, dep_cache)
-                if stop_analysis:
-                    return
+                enqueue(dep_commit)
             elif choice.startswith("Continuar"):
                 stop_analysis = True
                 return
             if stop_analysis:
                 return
 
+# Los renombres se marcan como pendientes al modificarse y se escriben una
+# sola vez al salir, en lugar de reescribir el archivo tras cada cambio
+_file_renames_dirty = False
+
+def mark_file_renames_dirty():
+    global _file_renames_dirty
+    _file_renames_dirty = True
+
 def save_file_renames():
-    with open(".smart_cherry_pick_renames.json", "w") as f:
-        json.dump(file_renames, f, indent=2)
+    global _file_renames_dirty
+    if not _file_renames_dirty:
+        return
+    write_json_file(RENAMES_FILE, file_renames, compact=True)
+    _file_renames_dirty = False
+
+atexit.register(save_file_renames)
 
 def load_file_renames():
-    if os.path.exists(".smart_cherry_pick_renames.json"):
-        with open(".smart_cherry_pick_renames.json", "r") as f:
-            return json.load(f)
+    if os.path.exists(RENAMES_FILE):
+        return read_json_file(RENAMES_FILE)
     return {}
 
 def process_commit(commit, dep_cache):
@@ -1020,98 +2410,115 @@ def process_commit(commit, dep_cache):
         
         if dry_run:
             print(Fore.YELLOW + f"[Modo simulación] Se aplicaría cherry-pick a {commit}")
-            final_commits.append(commit)
+            final_commits.setdefault(commit)
+            pending_commits.add(commit)
             return
 
         op_key = start_operation_timer(commit, "direct_cherry_pick")
         
         # Preparar la referencia del commit
-        commit_ref = commit
-        if remote_name:
-            remote_ref = f"{remote_name}/{commit}"
-            test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-            if test_exists:
-                commit_ref = remote_ref
+        commit_ref = resolve_commit_ref(commit)
         
         # Intentar aplicar el cherry-pick
         start_time = time.time()
-        result = subprocess.run(f"git cherry-pick --empty=drop {commit_ref}", shell=True)
+        returncode = cherry_pick_commit(commit_ref, "--empty=drop")
         duration = time.time() - start_time
         
         # Manejar el resultado
-        if result.returncode == 0:
+        if returncode == 0:
             applied_commits.add(commit)
-            final_commits.append(commit)
+            final_commits.setdefault(commit)
+            pending_commits.add(commit)
             print(Fore.GREEN + f"Commit {commit} aplicado exitosamente en {duration:.2f} segundos.")
             end_operation_timer(op_key, "success")
         else:
             log_message(f"Error al aplicar cherry-pick directo para {commit}", "WARNING")
             handle_cherry_pick_error(commit)
+        invalidate_tracked_files()
+        forget_last_commits(get_commit_files(commit))
     elif choice.startswith("Editar"):
         edit_commit_before_applying(commit)
+        invalidate_tracked_files()
+        forget_last_commits(get_commit_files(commit))
     else:  # Omitir commit
         skipped_commits.add(commit)
         log_message(f"Commit {commit} omitido por elección del usuario.", "INFO")
 
 def edit_commit_before_applying(commit):
-    commit_ref = commit
-    if remote_name:
-        remote_ref = f"{remote_name}/{commit}"
-        test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-        if test_exists:
-            commit_ref = remote_ref
+    commit_ref = resolve_commit_ref(commit)
 
     print(Fore.YELLOW + f"\nIniciando edición del commit {commit}...")
     # Ejecuta el cherry-pick en modo no-commit para obtener los cambios en el índice.
-    result = subprocess.run(f"git cherry-pick -n {commit_ref}", shell=True)
+    result = subprocess.run(["git", "cherry-pick", "-n", commit_ref])
     if result.returncode != 0:
         log_message(f"No se pudieron extraer los cambios del commit {commit} para editar.", "ERROR")
         return
 
+    # Se obtiene la lista de archivos modificados a partir del índice
+    changed_files = run(["git", "diff", "--cached", "--name-only", "-z"])
+    if not changed_files:
+        # Sin cambios no hay nada que editar ni que confirmar: el commit ya está
+        # contenido en la rama, así que se omiten los editores y el commit
+        log_message(f"El commit {commit} no introduce cambios en la rama actual; no hay nada que editar.", "INFO")
+        applied_commits.add(commit)
+        final_commits.setdefault(commit)
+        pending_commits.add(commit)
+        return
+
     editor_cmd = get_preferred_editor()
 
-    # Se obtiene la lista de archivos modificados a partir del índice
-    changed_files = run("git diff --cached --name-only")
-    if changed_files:
-        archivos = changed_files.splitlines()
-        print(Fore.YELLOW + f"Abriendo el editor ({editor_cmd}) para editar los siguientes archivos:")
-        for a in archivos:
-            print(Fore.CYAN + f" - {a}")
-        # Llama al editor pasando la lista de archivos para que se abran en buffers (por ejemplo, en nvim).
-        # Usamos shell=False para evitar problemas de interpretación de argumentos
-        subprocess.run([editor_cmd] + archivos, shell=False)
-    else:
-        print(Fore.YELLOW + "No se encontraron archivos modificados para editar.")
+    archivos = [f for f in changed_files.split("\0") if f]
 
     # Extrae el mensaje original del commit y lo ubica en un fichero temporal.
-    commit_message = run(f"git log -1 --pretty=format:%B {commit_ref}").strip()
+    # El editor necesita un archivo; se borra siempre, incluso si se interrumpe
+    commit_message = get_commit_message(commit_ref)
     with tempfile.NamedTemporaryFile(mode="w+", delete=False) as msg_file:
         msg_file.write(commit_message)
         temp_msg_file = msg_file.name
 
-    print(Fore.YELLOW + f"Abriendo el editor ({editor_cmd}) para editar el mensaje del commit...")
-    # Usamos shell=False para evitar problemas de interpretación de argumentos
-    subprocess.run([editor_cmd, temp_msg_file], shell=False)
+    # Archivos sin seguimiento previos a la edición: después solo se añaden los
+    # cambiados y los que se hayan creado en el editor, sin recorrer todo el árbol
+    untracked_before = set(list_untracked_files())
 
-    # Agrega todos los cambios y crea el commit utilizando el mensaje editado.
-    subprocess.run("git add .", shell=True)
-    subprocess.run(f"git commit -F {temp_msg_file}", shell=True)
-    os.unlink(temp_msg_file)
+    try:
+        # Usamos shell=False para evitar problemas de interpretación de argumentos
+        multi_file_args = multi_file_editor_args(editor_cmd)
+        if multi_file_args is not None:
+            # Una sola sesión del editor con el mensaje y los archivos
+            print(Fore.YELLOW + f"Abriendo el editor ({editor_cmd}) con el mensaje del commit y los siguientes archivos:")
+            for a in archivos:
+                print(Fore.CYAN + f" - {a}")
+            subprocess.run([editor_cmd, *multi_file_args, temp_msg_file] + archivos, shell=False)
+        else:
+            print(Fore.YELLOW + f"Abriendo el editor ({editor_cmd}) para editar los siguientes archivos:")
+            for a in archivos:
+                print(Fore.CYAN + f" - {a}")
+            # Llama al editor pasando la lista de archivos para que se abran en buffers
+            subprocess.run([editor_cmd] + archivos, shell=False)
+
+            print(Fore.YELLOW + f"Abriendo el editor ({editor_cmd}) para editar el mensaje del commit...")
+            subprocess.run([editor_cmd, temp_msg_file], shell=False)
+
+        # Agrega los cambios y crea el commit utilizando el mensaje editado.
+        created = [f for f in list_untracked_files() if f not in untracked_before]
+        git_stage_paths(archivos + created)
+        subprocess.run(["git", "commit", "-F", temp_msg_file])
+    finally:
+        os.unlink(temp_msg_file)
 
     applied_commits.add(commit)
-    final_commits.append(commit)
+    final_commits.setdefault(commit)
+    pending_commits.add(commit)
     print(Fore.GREEN + f"Commit {commit} editado y aplicado correctamente.")
 
 def ask_to_proceed():
 
     for commit in initial_commits:
-        if commit not in final_commits:
-            final_commits.append(commit)
+        final_commits.setdefault(commit)
+        pending_commits.add(commit)
 
-    unique_commits = []
-    for commit in final_commits:
-        if commit not in unique_commits:
-            unique_commits.append(commit)
+    unique_commits = list(final_commits)
+    prefetch_commit_contexts(unique_commits)
 
     while True:
         print(Fore.CYAN + "\nCommits seleccionados para aplicar:")
@@ -1146,21 +2553,27 @@ def ask_to_proceed():
 def apply_commits_in_order():
     # Asegurar que todos los commits iniciales estén incluidos
     for commit in initial_commits:
-        if commit not in final_commits and commit not in skipped_commits:
-            final_commits.append(commit)
-
-    # Crear una lista ordenada de commits únicos
-    unique_commits = OrderedDict()
-    for commit in final_commits:
-        if commit not in unique_commits and commit not in skipped_commits:
-            unique_commits[commit] = None
-
-    commit_list = list(unique_commits.keys())
+        if commit not in skipped_commits:
+            final_commits.setdefault(commit)
+            pending_commits.add(commit)
+
+    # final_commits ya conserva el orden y no tiene duplicados; las
+    # dependencias se añaden después del commit que las necesita, así que la
+    # lista se reordena según el historial antes de aplicarla
+    commit_list = [commit for commit in final_commits if commit not in skipped_commits]
+    resolved_refs = resolve_commit_refs(commit_list)
+    commit_parents = read_commit_parents([resolved_refs.get(c, c) for c in commit_list])
+    commit_parents = {
+        c: commit_parents[resolved_refs.get(c, c)]
+        for c in commit_list if resolved_refs.get(c, c) in commit_parents
+    }
+    commit_list = order_commits_topologically(commit_list, commit_parents)
     save_commits_list(commit_list)
     log_message(f"Se guardarán {len(commit_list)} commits en '{COMMITS_LIST_FILE}'", "INFO")
 
     if dry_run:
         print(Fore.YELLOW + f"[Modo simulación] Se aplicarían {len(commit_list)} commits:")
+        prefetch_commit_contexts(commit_list)
         for i, commit in enumerate(commit_list, 1):
             print(Fore.YELLOW + f"  {i}. {get_commit_context(commit)}")
         return
@@ -1174,6 +2587,15 @@ def apply_commits_in_order():
     global_stats_key = start_operation_timer("batch", "apply_all_commits")
     if global_stats_key in stats_data:
         stats_data[global_stats_key]["file_count"] = total_commits
+
+    # En proyectos grandes se usa --allow-empty para procesar rápidamente
+    # commits que podrían ser vacíos
+    large_batch = total_commits > 50
+    cherry_pick_flags = ("--allow-empty", "--empty=drop") if large_batch else ("--empty=drop",)
+
+    # Los tramos de commits consecutivos se aplican con un solo cherry-pick
+    range_applied = set()
+    single_commits = set()  # tramos que fallaron: se aplican commit a commit
     
     for batch_start in range(0, total_commits, batch_size):
         batch_end = min(batch_start + batch_size, total_commits)
@@ -1185,6 +2607,9 @@ def apply_commits_in_order():
             overall_idx = batch_start + idx
             show_progress(overall_idx + 1, total_commits, "Aplicando commits")
 
+            if commit in range_applied:
+                continue
+
             if commit in applied_commits:
                 log_message(f"Commit {commit} ya fue aplicado previamente. Saltando.", "INFO")
                 success_count += 1
@@ -1198,25 +2623,36 @@ def apply_commits_in_order():
             op_key = start_operation_timer(commit, "cherry_pick")
 
             # Preparar la referencia del commit
-            commit_ref = commit
-            if remote_name:
-                remote_ref = f"{remote_name}/{commit}"
-                test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-                if test_exists:
-                    commit_ref = remote_ref
+            commit_ref = resolved_refs.get(commit, commit)
+
+            run_end = idx
+            if commit not in single_commits:
+                run_end = contiguous_run_end(
+                    batch, idx, commit_parents,
+                    lambda c: c in applied_commits or c in skipped_commits or c in single_commits
+                )
+            if run_end > idx:
+                run_commits = batch[idx:run_end + 1]
+                last_ref = resolved_refs.get(run_commits[-1], run_commits[-1])
+                print(Fore.GREEN + f"\n[{overall_idx+1}-{batch_start+run_end+1}/{total_commits}] Aplicando cherry-pick --empty=drop {commit}^..{run_commits[-1]}...")
+                if apply_commit_range(commit_ref, last_ref, cherry_pick_flags):
+                    for c in run_commits:
+                        applied_commits.add(c)
+                        range_applied.add(c)
+                    success_count += len(run_commits)
+                    end_operation_timer(op_key, "success")
+                    log_message(f"{len(run_commits)} commits aplicados exitosamente en un solo cherry-pick.", "SUCCESS")
+                    continue
+                single_commits.update(run_commits)
+                log_message(f"El tramo {commit[:8]}..{run_commits[-1][:8]} no se pudo aplicar de una vez; se aplicará commit a commit", "WARNING")
 
             # Intentar aplicar el commit
             print(Fore.GREEN + f"\n[{overall_idx+1}/{total_commits}] Aplicando cherry-pick --empty=drop {commit}...")
             
-            # Verificar si es un proyecto grande y optimizar
-            if total_commits > 50:  # Para proyectos grandes
-                # Usamos --allow-empty para procesar rápidamente commits que podrían ser vacíos
-                result = subprocess.run(f"git cherry-pick --allow-empty --empty=drop {commit_ref}", shell=True)
-            else:
-                result = subprocess.run(f"git cherry-pick --empty=drop {commit_ref}", shell=True)
+            returncode = cherry_pick_commit(commit_ref, *cherry_pick_flags)
 
             # Manejar el resultado
-            if result.returncode != 0:
+            if returncode != 0:
                 fail_count += 1
                 end_operation_timer(op_key, "failure")
                 handle_cherry_pick_error(commit)
@@ -1227,7 +2663,7 @@ def apply_commits_in_order():
                 log_message(f"Commit {commit} aplicado exitosamente.", "SUCCESS")
         
         # Si estamos en un proyecto grande, guardar el progreso después de cada lote
-        if total_commits > 50:
+        if large_batch:
             save_history(applied_commits)
             log_message(f"Progreso guardado: {success_count}/{total_commits} commits aplicados", "INFO")
 
@@ -1249,15 +2685,113 @@ def apply_commits_in_order():
 
     save_history(applied_commits)
 
-def parse_not_existing_files(error_output):
-    not_exist_files = []
-    pattern = r"error: ([^:]+): does not exist in index"
-    matches = re.findall(pattern, error_output)
+def contiguous_run_end(batch, start, commit_parents, is_excluded):
+    # Último índice de la cadena lineal que empieza en batch[start]: cada commit
+    # tiene un único padre y ese padre es el commit anterior de la lista
+    first = commit_parents.get(batch[start])
+    if first is None or len(first[1]) != 1:
+        return start
+    end = start
+    while end + 1 < len(batch):
+        current = commit_parents.get(batch[end])
+        following = batch[end + 1]
+        info = commit_parents.get(following)
+        if is_excluded(following) or info is None or info[1] != [current[0]]:
+            break
+        end += 1
+    return end
+
+# Hooks que `git cherry-pick` ejecuta al crear el commit
+CHERRY_PICK_HOOKS = ("prepare-commit-msg", "post-commit", "post-rewrite")
+
+@functools.lru_cache(maxsize=1)
+def needs_git_cherry_pick():
+    # libgit2 solo aplica sus filtros internos (eol, ident) y no ejecuta hooks:
+    # con un `filter.<driver>` configurado (p. ej. git-lfs) escribiría en el
+    # árbol de trabajo el contenido sin pasar por el smudge, y se saltaría los
+    # hooks que sí ejecuta git. En esos repositorios se usa siempre git, igual
+    # que con GIT_COMMITTER_DATE, que git admite en muchos formatos
+    if os.environ.get("GIT_COMMITTER_DATE"):
+        return True
+    try:
+        if any(entry.name.startswith("filter.") for entry in pygit2_repository().config):
+            return True
+    except pygit2.GitError:
+        return True
+    hooks_dir = run(["git", "rev-parse", "--git-path", "hooks"], allow_fail=True)
+    if not hooks_dir:
+        return True
+    return any(os.access(os.path.join(hooks_dir, hook), os.X_OK) for hook in CHERRY_PICK_HOOKS)
+
+# Identidad de `git var GIT_COMMITTER_IDENT`: "Nombre <correo> <fecha> <zona>"
+COMMITTER_IDENT_RE = re.compile(r'^(.*) <(.*)> \d+ [+-]\d{4}$')
+
+@functools.lru_cache(maxsize=1)
+def committer_identity():
+    # Nombre y correo del committer tal como los resuelve git (GIT_COMMITTER_*,
+    # committer.* y user.*), o None si no hay identidad configurada.
+    # repo.default_signature solo lee user.name y user.email
+    match = COMMITTER_IDENT_RE.match(run(["git", "var", "GIT_COMMITTER_IDENT"], allow_fail=True))
+    return match.groups() if match else None
+
+def cherry_pick_in_process(commit_ref):
+    # Aplica un commit sin lanzar `git cherry-pick`: la fusión de árboles se
+    # hace en memoria con pygit2 y el árbol de trabajo solo se toca si no hay
+    # conflictos. Devuelve False si no se aplicó (conflictos, merges, commits
+    # vacíos, cambios locales...) sin haber modificado nada, para que el
+    # llamador recurra a git, que deja el estado de conflicto habitual
+    if pygit2 is None or needs_git_cherry_pick():
+        return False
+    identity = committer_identity()
+    if identity is None:
+        return False
+    try:
+        repo = pygit2_repository()
+        if repo.head_is_unborn or "commit.gpgsign" in repo.config and repo.config.get_bool("commit.gpgsign"):
+            return False
+        commit = repo.revparse_single(commit_ref).peel(pygit2.Commit)
+        if len(commit.parents) != 1 or commit.parents[0].tree_id == commit.tree_id:
+            return False
+        head = repo.head.peel(pygit2.Commit)
+        index = repo.index
+        index.read()
+        if index.conflicts is not None or index.write_tree() != head.tree_id:
+            return False
+        merged = repo.merge_trees(commit.parents[0].tree, head.tree, commit.tree)
+        if merged.conflicts is not None:
+            return False
+        tree_id = merged.write_tree(repo)
+        if tree_id == head.tree_id:
+            # Como --empty=drop: el commit ya no aporta cambios
+            return True
+        repo.checkout_tree(repo[tree_id], strategy=pygit2.GIT_CHECKOUT_SAFE)
+        repo.create_commit(
+            "HEAD", commit.author, pygit2.Signature(*identity),
+            commit.message, tree_id, [head.id]
+        )
+        return True
+    except (pygit2.GitError, KeyError, ValueError) as e:
+        log_message(f"Cherry-pick con pygit2 no disponible para {commit_ref}: {str(e)}", "DEBUG")
+        return False
+
+def cherry_pick_commit(commit_ref, *flags):
+    # `git cherry-pick <flags> <commit>`, resuelto en proceso cuando se puede;
+    # devuelve el código de salida
+    if cherry_pick_in_process(commit_ref):
+        return 0
+    return subprocess.run(["git", "cherry-pick", *flags, commit_ref]).returncode
 
-    for match in matches:
-        not_exist_files.append(match.strip())
+def apply_commit_range(first_ref, last_ref, flags):
+    # Aplica `first^..last` con un solo cherry-pick; si falla se deshace por
+    # completo para que el llamador aplique los commits uno a uno
+    result = subprocess.run(["git", "cherry-pick", *flags, f"{first_ref}^..{last_ref}"])
+    if result.returncode == 0:
+        return True
+    run(["git", "cherry-pick", "--abort"], allow_fail=True)
+    return False
 
-    return not_exist_files
+def parse_not_existing_files(error_output):
+    return [match.group(1).strip() for match in NOT_EXIST_RE.finditer(error_output)]
 
 def handle_cherry_pick_error(commit):
     op_key = start_operation_timer(commit, "error_resolution")
@@ -1267,8 +2801,8 @@ def handle_cherry_pick_error(commit):
     if auto_mode:
         # Primero intentamos con --strategy-option=theirs
         log_message("Modo automático: intentando resolver conflictos con --strategy-option=theirs", "INFO")
-        run("git cherry-pick --abort", allow_fail=True)
-        result = subprocess.run(f"git cherry-pick --strategy-option=theirs {commit}", shell=True)
+        run(["git", "cherry-pick", "--abort"], allow_fail=True)
+        result = subprocess.run(["git", "cherry-pick", "--strategy-option=theirs", commit])
         if result.returncode == 0:
             applied_commits.add(commit)
             resolution_method = "auto_theirs"
@@ -1278,8 +2812,8 @@ def handle_cherry_pick_error(commit):
 
         # Si falla, intentamos con --strategy-option=ours
         log_message("Falló resolución 'theirs', intentando con 'ours'", "INFO")
-        run("git cherry-pick --abort", allow_fail=True)
-        result = subprocess.run(f"git cherry-pick --strategy-option=ours {commit}", shell=True)
+        run(["git", "cherry-pick", "--abort"], allow_fail=True)
+        result = subprocess.run(["git", "cherry-pick", "--strategy-option=ours", commit])
         if result.returncode == 0:
             applied_commits.add(commit)
             resolution_method = "auto_ours"
@@ -1289,9 +2823,8 @@ def handle_cherry_pick_error(commit):
 
     log_message(f"Error al aplicar el commit {commit}. Analizando conflictos...", "ERROR")
 
-    error_output = run("git status 2>&1")
+    error_output, failed_files = read_conflict_status()
     not_exist_files = parse_not_existing_files(error_output)
-    failed_files = run("git diff --name-only --diff-filter=U").splitlines()
     
     # Actualizar estadísticas con información de conflictos
     if op_key in stats_data:
@@ -1302,7 +2835,7 @@ def handle_cherry_pick_error(commit):
         for f in not_exist_files:
             print(Fore.YELLOW + f" - {f}")
 
-        run("git cherry-pick --abort")
+        run(["git", "cherry-pick", "--abort"])
         resolution_method = "missing_files_handling"
         
         missing_handled_count = 0
@@ -1329,15 +2862,9 @@ def handle_cherry_pick_error(commit):
 
         print(Fore.GREEN + f"\nIntentando aplicar cherry-pick nuevamente para {commit}...")
 
-        commit_ref = commit
-        if remote_name:
-            remote_ref = f"{remote_name}/{commit}"
-            test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-            if test_exists:
-                commit_ref = remote_ref
+        commit_ref = resolve_commit_ref(commit)
 
-        result = subprocess.run(f"git cherry-pick --empty=drop {commit_ref}", shell=True)
-        if result.returncode == 0:
+        if cherry_pick_commit(commit_ref, "--empty=drop") == 0:
             applied_commits.add(commit)
             log_message(f"Commit {commit} aplicado exitosamente después de resolver archivos faltantes.", "SUCCESS")
             end_operation_timer(op_key, "success", resolution_method)
@@ -1356,13 +2883,12 @@ def handle_cherry_pick_error(commit):
             resolution_method = "auto_conflict_resolution"
             
             # Primero intentamos usar git automáticamente
-            result = run("git -c core.editor=true merge --continue 2>&1", allow_fail=True)
+            result = run(["git", "-c", "core.editor=true", "merge", "--continue"], allow_fail=True, merge_stderr=True)
             if "use 'git add' to mark resolution" not in result:
                 # Intentar añadir todos los archivos automáticamente
-                for file in failed_files:
-                    run(f"git add {file}", allow_fail=True)
+                git_stage_paths(failed_files)
                 
-                result = run("git cherry-pick --continue 2>&1", allow_fail=True)
+                result = run(["git", "cherry-pick", "--continue"], allow_fail=True, merge_stderr=True)
                 if "fixed-up" in result or "successfully" in result:
                     applied_commits.add(commit)
                     log_message(f"Conflictos resueltos automáticamente para {commit}", "SUCCESS")
@@ -1370,13 +2896,14 @@ def handle_cherry_pick_error(commit):
                     return
             
             # Si eso falla, intentar manejar renombres
-            run("git cherry-pick --abort", allow_fail=True)
+            run(["git", "cherry-pick", "--abort"], allow_fail=True)
             handled = True
             for file in failed_files:
                 # Buscar archivo más similar
                 similar_files = find_similar_files(file)
                 if similar_files and similar_files[0][1] > 70:  # Si hay un archivo similar con score > 70
                     file_renames[file] = similar_files[0][0]
+                    mark_file_renames_dirty()
                     log_message(f"Auto-renombramiento: {file} -> {similar_files[0][0]}", "INFO")
                 else:
                     handled = False
@@ -1403,7 +2930,7 @@ def handle_cherry_pick_error(commit):
                 end_operation_timer(op_key, "failure", resolution_method)
         elif choice.startswith("Intentar"):
             resolution_method = "manual_rename_handling"
-            run("git cherry-pick --abort")
+            run(["git", "cherry-pick", "--abort"])
             handled = ask_file_renames_from_errors(failed_files)
             if handled:
                 if apply_patch_with_rename_handling(commit):
@@ -1416,29 +2943,30 @@ def handle_cherry_pick_error(commit):
                 end_operation_timer(op_key, "failure", resolution_method)
         else:
             resolution_method = "aborted"
-            run("git cherry-pick --abort")
+            run(["git", "cherry-pick", "--abort"])
             log_message(f"Cherry-pick abortado para el commit {commit}.", "WARNING")
             end_operation_timer(op_key, "aborted", resolution_method)
     else:
         resolution_method = "unknown_error"
-        run("git cherry-pick --abort")
+        run(["git", "cherry-pick", "--abort"])
         log_message(f"Cherry-pick fallido pero no se detectaron conflictos. Saltando commit.", "ERROR")
         end_operation_timer(op_key, "failure", resolution_method)
 
+@functools.lru_cache(maxsize=1)
 def get_current_branch():
+    # La herramienta nunca cambia de rama: basta con consultarla una vez
     return subprocess.run(
         ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-        capture_output=True, text=True, check=False
+        capture_output=True, text=True, check=False, env=GIT_ENV
     ).stdout.strip()
 
-def get_file_content_at_commit(file_path, commit, branch_name):
+def get_file_content_at_commit(file_path, commit, branch_name=None):
 
-    branch_name = branch_name or get_current_branch()
     if verbose_mode:
-        print(f"Rama actual: {branch_name}")
+        print(f"Rama actual: {branch_name or get_current_branch()}")
     
     # Intenta obtener el contenido directamente
-    content = run(f"git show {commit}:{file_path}", allow_fail=True)
+    content = read_file_at(commit, file_path)
     if content:
        return content  
     
@@ -1448,31 +2976,33 @@ def get_file_content_at_commit(file_path, commit, branch_name):
             log_message(f"Intentando obtener {file_path} de {commit} vía remote {remote_name}", "DEBUG")
 
         # Intenta hacer fetch del commit específico
-        run(f"git fetch {remote_name} {commit}", allow_fail=True)
+        ensure_remote_fetched(ref=commit)
         
         # Intenta con la referencia remota completa
         remote_commit = f"{remote_name}/{commit}"
-        content = run(f"git show {remote_commit}:{file_path}", allow_fail=True)
+        content = read_file_at(remote_commit, file_path)
         if content:
            return content
            
         # Intenta buscar en otras ramas remotas
-        remote_branches = run(f"git branch -r | grep {remote_name}/", allow_fail=True).splitlines()
-        for remote_branch in remote_branches:
-            content = run(f"git show {remote_branch}:{file_path}", allow_fail=True)
+        for branch in remote_branch_names():
+            remote_branch = f"{remote_name}/{branch}"
+            content = read_file_at(remote_branch, file_path)
             if content:
                 log_message(f"Archivo encontrado en rama remota: {remote_branch}", "INFO")
                 return content
 
-    # Busca en commits recientes
-    recent_commits = run(f"git log -n 50 --pretty=format:'%H'", allow_fail=True).splitlines()
-    for recent_commit in recent_commits:
-        if recent_commit != commit:  # Evita intentar con el mismo commit
-            content = run(f"git show {recent_commit}:{file_path}", allow_fail=True)
-            if content:
-                log_message(f"Se encontró el archivo en un commit reciente: {recent_commit[:8]}", "INFO")
-                return content
-    
+    # Último commit del historial que dejó el archivo en el árbol (cualquier
+    # cambio salvo borrarlo); con el commit-graph la consulta por ruta no
+    # recorre cada commit, a diferencia de probar uno a uno los recientes
+    # `-n 1` se aplicaría antes del filtro: se corta la lectura tras el primero
+    recent_commit = next(iter_log_hashes("--diff-filter=ACMRT", "--", file_path), None)
+    if recent_commit and recent_commit != commit:
+        content = read_file_at(recent_commit, file_path)
+        if content:
+            log_message(f"Se encontró el archivo en un commit reciente: {recent_commit[:8]}", "INFO")
+            return content
+
     log_message(f"No se pudo obtener contenido de {file_path} en ninguna referencia", "WARNING")
     return None
 
@@ -1486,12 +3016,15 @@ def handle_missing_file(missing_file, adding_commit, current_commit):
         return False
 
     print(Fore.CYAN + f"\nSe encontraron {len(commit_chain)} commits relacionados con '{missing_file}':")
-    max_display = min(5, len(commit_chain))
-    for i, commit in enumerate(commit_chain[:max_display], 1):
+    # Solo se muestran (y se consultan) los primeros commits de la cadena
+    shown = list(itertools.islice(commit_chain, 5))
+    prefetch_commit_contexts(shown)
+    for i, commit in enumerate(shown, 1):
         print(Fore.CYAN + f" {i}. {get_commit_context(commit)}")
 
-    if len(commit_chain) > max_display:
-        print(Fore.CYAN + f"   ... y {len(commit_chain)-max_display} más.")
+    extra = len(commit_chain) - len(shown)
+    if extra > 0:
+        print(Fore.CYAN + f"   ... y {extra} más.")
 
     options = [
         f"Agregar todos los {len(commit_chain)} commits que modificaron el archivo",
@@ -1529,21 +3062,16 @@ def handle_missing_file(missing_file, adding_commit, current_commit):
 
         local_name = input(f"Archivo local para '{missing_file}': ").strip()
         file_renames[missing_file] = local_name
-        save_file_renames()  
+        mark_file_renames_dirty()  
         return True
 
     elif choice.startswith("Crear"):
 
-        commit_ref = current_commit
-        if remote_name:
-            remote_ref = f"{remote_name}/{current_commit}"
-            test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-            if test_exists:
-                commit_ref = remote_ref
+        commit_ref = resolve_commit_ref(current_commit)
 
         try:
 
-            file_content = get_file_content_at_commit(missing_file, current_commit, get_current_branch())
+            file_content = get_file_content_at_commit(missing_file, current_commit)
             if file_content:
 
                 directory = os.path.dirname(missing_file)
@@ -1555,7 +3083,7 @@ def handle_missing_file(missing_file, adding_commit, current_commit):
 
                 log_message(f"Archivo '{missing_file}' creado exitosamente.", "SUCCESS")
 
-                run(f"git add {missing_file}")
+                run(["git", "add", missing_file])
                 created_files.add(missing_file)
                 return True
             else:
@@ -1579,12 +3107,17 @@ def ask_file_renames_from_errors(failed_files):
         log_message("No hay archivos con problemas para renombrar.", "INFO")
         return False
     
-    # Detectar archivos con conflictos modify/delete
-    git_status = run("git status", allow_fail=True)
+    # Detectar archivos con conflictos modify/delete. La lista conserva el orden
+    # para mostrarla; el set responde a las comprobaciones de pertenencia
+    git_status = git_status_snapshot()[0]
     modify_delete_files = []
+    modify_delete_set = set()
     for archivo in failed_files:
+        if archivo in modify_delete_set:
+            continue
         if f"{archivo} deleted in HEAD" in git_status or f"CONFLICT (modify/delete): {archivo}" in git_status:
             modify_delete_files.append(archivo)
+            modify_delete_set.add(archivo)
     
     has_modify_delete = len(modify_delete_files) > 0
     if has_modify_delete:
@@ -1594,20 +3127,18 @@ def ask_file_renames_from_errors(failed_files):
     if auto_mode:
         log_message("Modo automático: intentando resolver conflictos de archivos", "INFO")
         rename_count = 0
+        # Los archivos recreados se añaden al índice juntos al final
+        recreated = []
         
         for archivo in failed_files:
-            if archivo in modify_delete_files:
+            if archivo in modify_delete_set:
                 # Si el archivo fue eliminado en HEAD pero modificado en el commit, recrearlo
                 try:
-                    # Intentar obtener contenido del archivo desde el commit a aplicar (MERGE_HEAD)
-                    content = run(f"git show MERGE_HEAD:{archivo}", allow_fail=True)
+                    # Intentar obtener contenido del archivo desde el commit a aplicar (CHERRY_PICK_HEAD)
+                    content = read_picked_file(archivo)
                     if content:
-                        # Crear directorios si es necesario
-                        os.makedirs(os.path.dirname(archivo), exist_ok=True)
-                        # Escribir el archivo
-                        with open(archivo, "w") as f:
-                            f.write(content)
-                        run(f"git add {archivo}", allow_fail=True)
+                        write_worktree_file(archivo, content)
+                        recreated.append(archivo)
                         log_message(f"Archivo recreado automáticamente: {archivo}", "INFO")
                         rename_count += 1
                     else:
@@ -1619,10 +3150,11 @@ def ask_file_renames_from_errors(failed_files):
                 similar_files = find_similar_files(archivo)
                 if similar_files and similar_files[0][1] > 70:  # Si hay un archivo similar con score > 70%
                     file_renames[archivo] = similar_files[0][0]
+                    mark_file_renames_dirty()
                     log_message(f"Mapeo automático: {archivo} -> {similar_files[0][0]} (similitud: {similar_files[0][1]}%)", "INFO")
                     rename_count += 1
-        
-        save_file_renames()  # Guardar siempre los renombres, incluso parciales
+
+        git_stage_paths(recreated)
         
         if rename_count == len(failed_files):
             log_message(f"Se resolvieron automáticamente todos los {len(failed_files)} archivos", "SUCCESS")
@@ -1634,21 +3166,36 @@ def ask_file_renames_from_errors(failed_files):
         else:
             log_message("No se pudo resolver ningún archivo automáticamente", "WARNING")
             
-    # Modo interactivo para usuario
+    # Modo interactivo para usuario. Las líneas del menú se calculan una vez y
+    # solo se rehace la del archivo que se acaba de tratar; el menú completo se
+    # vuelve a mostrar solo cuando cambió algo, no tras una entrada inválida
+    def menu_line(i, archivo):
+        tipo = "(modify/delete)" if archivo in modify_delete_set else ""
+        return f"{i}. {file_renames.get(archivo, archivo)} {tipo}"
+
+    menu_lines = [menu_line(i, archivo) for i, archivo in enumerate(failed_files, 1)]
+    terminar_opcion = len(failed_files) + 1
+    cancelar_opcion = len(failed_files) + 2
+    show_menu = True
+    changed_idx = None
+
     while True:
-        print(Fore.RED + "\nCherry-pick fallido. Posibles errores por archivos con conflictos:")
-        
-        # Mostrar archivos con problemas
-        for i, archivo in enumerate(failed_files, 1):
-            ruta_actual = file_renames.get(archivo, archivo)
-            tipo = "(modify/delete)" if archivo in modify_delete_files else ""
-            print(Fore.YELLOW + f"{i}. {ruta_actual} {tipo}")
-        
-        # Opciones adicionales
-        terminar_opcion = len(failed_files) + 1
-        cancelar_opcion = len(failed_files) + 2
-        print(Fore.GREEN + f"{terminar_opcion}. Continuar con las rutas modificadas")
-        print(Fore.RED + f"{cancelar_opcion}. Cancelar y abortar el proceso")
+        if changed_idx is not None:
+            menu_lines[changed_idx - 1] = menu_line(changed_idx, failed_files[changed_idx - 1])
+            changed_idx = None
+            show_menu = True
+
+        if show_menu:
+            print(Fore.RED + "\nCherry-pick fallido. Posibles errores por archivos con conflictos:")
+            
+            # Mostrar archivos con problemas
+            for line in menu_lines:
+                print(Fore.YELLOW + line)
+            
+            # Opciones adicionales
+            print(Fore.GREEN + f"{terminar_opcion}. Continuar con las rutas modificadas")
+            print(Fore.RED + f"{cancelar_opcion}. Cancelar y abortar el proceso")
+            show_menu = False
         
         # Procesar la opción del usuario
         opcion = input(Fore.CYAN + "Selecciona una opción (número): ").strip()
@@ -1657,7 +3204,6 @@ def ask_file_renames_from_errors(failed_files):
         if opcion == str(terminar_opcion):
             # Verificar que al menos un archivo haya sido renombrado o manejado
             if any(archivo in file_renames for archivo in failed_files) or len(modify_delete_files) > 0:
-                save_file_renames()  # Guardar los cambios
                 return True
             else:
                 continuar = input(Fore.YELLOW + "No se han especificado renombres. ¿Continuar de todos modos? (s/n): ").lower()
@@ -1676,9 +3222,10 @@ def ask_file_renames_from_errors(failed_files):
             if 1 <= idx <= len(failed_files):
                 archivo = failed_files[idx - 1]
                 ruta_actual = file_renames.get(archivo, archivo)
+                changed_idx = idx
                 
                 # Caso especial para archivos modify/delete
-                if archivo in modify_delete_files:
+                if archivo in modify_delete_set:
                     print(Fore.CYAN + f"\nArchivo '{archivo}' fue eliminado en HEAD pero modificado en el commit.")
                     opciones = [
                         "Recrear el archivo con el contenido del commit",
@@ -1691,14 +3238,10 @@ def ask_file_renames_from_errors(failed_files):
                     if sel.startswith("Recrear"):
                         try:
                             # Intentar obtener contenido del archivo desde el commit a aplicar
-                            content = run(f"git show MERGE_HEAD:{archivo}", allow_fail=True)
+                            content = read_picked_file(archivo)
                             if content:
-                                # Crear directorios si es necesario - solo los que son necesarios
-                                os.makedirs(os.path.dirname(archivo), exist_ok=True)
-                                # Escribir el archivo
-                                with open(archivo, "w") as f:
-                                    f.write(content)
-                                run(f"git add {archivo}", allow_fail=True)
+                                write_worktree_file(archivo, content)
+                                run(["git", "add", archivo], allow_fail=True)
                                 log_message(f"Archivo recreado: {archivo}", "SUCCESS")
                             else:
                                 log_message(f"No se pudo obtener contenido para {archivo}", "ERROR")
@@ -1706,12 +3249,13 @@ def ask_file_renames_from_errors(failed_files):
                             log_message(f"Error al recrear archivo {archivo}: {str(e)}", "ERROR")
                     elif sel.startswith("Ignorar"):
                         # No hacer nada, dejarlo eliminado
-                        run(f"git rm {archivo}", allow_fail=True)
+                        run(["git", "rm", archivo], allow_fail=True)
                         log_message(f"Ignorando cambios en archivo eliminado: {archivo}", "INFO")
                     elif sel.startswith("Especificar"):
                         nueva_ruta = input(Fore.CYAN + f"Ingrese la ruta de un archivo equivalente para '{archivo}': ").strip()
                         if nueva_ruta:
                             file_renames[archivo] = nueva_ruta
+                            mark_file_renames_dirty()
                             log_message(f"Renombramiento configurado: {archivo} -> {nueva_ruta}", "INFO")
                     continue
                 
@@ -1728,6 +3272,7 @@ def ask_file_renames_from_errors(failed_files):
                         similar_idx = int(select_similar)
                         if 1 <= similar_idx <= len(similar_files[:5]):
                             file_renames[archivo] = similar_files[similar_idx-1][0]
+                            mark_file_renames_dirty()
                             log_message(f"Renombramiento configurado: {archivo} -> {similar_files[similar_idx-1][0]}", "INFO")
                             continue
                     except ValueError:
@@ -1739,6 +3284,7 @@ def ask_file_renames_from_errors(failed_files):
                 
                 if nueva_ruta:
                     file_renames[archivo] = nueva_ruta
+                    mark_file_renames_dirty()
                     log_message(f"Renombramiento configurado: {archivo} -> {nueva_ruta}", "INFO")
                 else:
                     print(Fore.YELLOW + "No se ingresó ninguna ruta. Se mantiene la ruta actual.")
@@ -1748,6 +3294,19 @@ def ask_file_renames_from_errors(failed_files):
             print(Fore.RED + "Por favor, ingresa un número válido.")
 
 
+def git_commit_with_message(message, fallback_message):
+    # `git commit -F -`: el mensaje va por stdin, sin archivo temporal. Si
+    # falla se repite con un mensaje simple; devuelve el código del primer intento
+    try:
+        returncode = subprocess.run(["git", "commit", "-F", "-"], input=message, text=True).returncode
+    except Exception as e:
+        log_message(f"Error al crear commit: {str(e)}", "ERROR")
+        returncode = 1
+    if returncode != 0:
+        log_message("Error al crear commit con mensaje original. Usando mensaje simple.", "WARNING")
+        subprocess.run(["git", "commit", "-m", fallback_message])
+    return returncode
+
 def apply_patch_with_rename_handling(commit):
     """
     Aplica un cherry-pick manejando renombres de archivos especificados en file_renames.
@@ -1757,24 +3316,22 @@ def apply_patch_with_rename_handling(commit):
     op_key = start_operation_timer(commit, "patch_rename_handling")
     
     # Preparar referencia del commit
-    commit_ref = commit
-    if remote_name:
-        remote_ref = f"{remote_name}/{commit}"
-        test_exists = run(f"git rev-parse --verify {remote_ref}^{{commit}} 2>/dev/null", allow_fail=True)
-        if test_exists:
-            commit_ref = remote_ref
+    commit_ref = resolve_commit_ref(commit)
 
     print(Fore.GREEN + f"\nAplicando cherry-pick con manejo de renombres para {commit}...")
     
     # Primero, intentar aplicar el cherry-pick directamente pero preservando los conflictos
-    message = run(f"git log -1 --pretty=format:%B {commit_ref}").strip()
+    message = get_commit_message(commit_ref)
     
-    # Aplicar los renombres a los archivos primero
+    # Aplicar los renombres a los archivos primero. `git status` no cambia
+    # dentro del bucle: se consulta una sola vez y solo si hace falta
+    git_status = None
     for origen, destino in file_renames.items():
         # Verificar si el archivo destino ya existe y origen no existe
         if os.path.exists(destino) and not os.path.exists(origen):
             # Verificar si es un caso de modify/delete consultando git status
-            git_status = run("git status", allow_fail=True)
+            if git_status is None:
+                git_status = git_status_snapshot()[0]
             is_modify_delete = (f"{origen} deleted in HEAD" in git_status or 
                                 f"CONFLICT (modify/delete): {origen}" in git_status)
             
@@ -1789,7 +3346,7 @@ def apply_patch_with_rename_handling(commit):
                 try:
                     if os.name == 'posix':
                         # Crear un enlace simbólico
-                        run(f"ln -sf {destino} {origen}", allow_fail=True)
+                        run(["ln", "-sf", destino, origen], allow_fail=True)
                     else:
                         # En otros sistemas, copiar el archivo
                         import shutil
@@ -1798,46 +3355,31 @@ def apply_patch_with_rename_handling(commit):
                     log_message(f"Error al crear enlace para renombre: {str(e)}", "ERROR")
     
     # Intentar aplicar el cherry-pick directamente, sin hacer commit
-    cherry_result = run(f"git cherry-pick --no-commit {commit_ref} 2>&1", allow_fail=True)
+    cherry_result = run(["git", "cherry-pick", "--no-commit", commit_ref], allow_fail=True, merge_stderr=True)
     cherry_success = "error: could not apply" not in cherry_result and "CONFLICT" not in cherry_result
     
     if cherry_success:
         # El cherry-pick se aplicó sin conflictos, crear commit con el mensaje original
-        try:
-            with tempfile.NamedTemporaryFile(mode="w+", delete=False) as msg_file:
-                msg_file.write(message)
-                msg_file_path = msg_file.name
-            
-            commit_result = subprocess.run(f"git commit -F {msg_file_path}", shell=True)
-            os.unlink(msg_file_path)
-            
-            log_message("Cherry-pick aplicado correctamente", "SUCCESS")
-            end_operation_timer(op_key, "success", "direct_cherry_pick")
-            applied_commits.add(commit)  # Marcar como aplicado
-            return True
-            
-        except Exception as e:
-            log_message(f"Error al crear commit: {str(e)}", "ERROR")
-            subprocess.run(f"git commit -m \"Cherry-pick {commit}\"", shell=True)
-            applied_commits.add(commit)  # Marcar como aplicado
-            return True
+        git_commit_with_message(message, f"Cherry-pick {commit}")
+        log_message("Cherry-pick aplicado correctamente", "SUCCESS")
+        end_operation_timer(op_key, "success", "direct_cherry_pick")
+        applied_commits.add(commit)  # Marcar como aplicado
+        return True
     
     # Si llegamos aquí, el cherry-pick falló con conflictos
     
     # Verificar qué archivos tienen conflictos
-    conflicted_files = run("git diff --name-only --diff-filter=U").splitlines()
+    # dict.fromkeys conserva el orden y evita duplicados sin búsquedas en lista
+    conflicted = dict.fromkeys(get_unmerged_files())
     
     # Comprobar si hay conflictos de tipo modify/delete
-    git_status = run("git status -s", allow_fail=True)
+    # El estado se analiza una sola vez; luego se consulta por ruta
+    status_codes = parse_conflict_status(git_status_snapshot()[1])
     modify_delete_files = []
     
-    for line in git_status.splitlines():
-        if "DU" in line or "UD" in line or "AA" in line or "UU" in line:
-            parts = line.split()
-            if len(parts) >= 2:
-                file_path = " ".join(parts[1:])
-                if file_path not in conflicted_files:
-                    conflicted_files.append(file_path)
+    for path in status_codes:
+        conflicted.setdefault(path)
+    conflicted_files = list(conflicted)
     
     # Mostrar información detallada del conflicto al estilo de git
     if conflicted_files:
@@ -1852,21 +3394,13 @@ def apply_patch_with_rename_handling(commit):
         print(Fore.RED + f"\nArchivos con conflictos detectados ({len(conflicted_files)}):")
         for file in conflicted_files:
             # Verificar si es un conflicto modify/delete
-            is_modify_delete = False
-            for line in git_status.splitlines():
-                if file in line and ("DU" in line or "UD" in line):
-                    is_modify_delete = True
-                    modify_delete_files.append(file)
-                    break
+            is_modify_delete = status_codes.get(file) in ("DU", "UD")
+            if is_modify_delete:
+                modify_delete_files.append(file)
             
             conflict_type = "(modify/delete)" if is_modify_delete else ""
             print(Fore.RED + f" - {file} {conflict_type}")
         
-        # Guardar mensaje de commit para usar más tarde
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as msg_file:
-            msg_file.write(message)
-            msg_path = msg_file.name
-        
         # En este punto, presentamos opciones al usuario como en un cherry-pick normal de git
         options = [
             "Resolver conflictos manualmente", 
@@ -1880,11 +3414,6 @@ def apply_patch_with_rename_handling(commit):
             if resume_cherry_pick(conflicted_files):
                 applied_commits.add(commit)  # Marcar como aplicado
                 log_message(f"Conflictos resueltos manualmente para commit {commit}", "SUCCESS")
-                # Limpiar archivo temporal
-                try:
-                    os.unlink(msg_path)
-                except:
-                    pass
                 end_operation_timer(op_key, "success", "manual_resolution")
                 return True
             else:
@@ -1894,16 +3423,10 @@ def apply_patch_with_rename_handling(commit):
                 
         elif choice.startswith("Intentar"):
             # Reiniciar el cherry-pick
-            run("git cherry-pick --abort", allow_fail=True)
+            run(["git", "cherry-pick", "--abort"], allow_fail=True)
             
             # Intentar con método de renombres
             handled = ask_file_renames_from_errors(conflicted_files)
-            
-            # Limpiar archivo temporal
-            try:
-                os.unlink(msg_path)
-            except:
-                pass
                 
             if handled:
                 # Si los renombres fueron manejados, continuar con el proceso de parche
@@ -1915,13 +3438,7 @@ def apply_patch_with_rename_handling(commit):
                 return False
         else:
             # Abortar cherry-pick
-            run("git cherry-pick --abort", allow_fail=True)
-            
-            # Limpiar archivo temporal
-            try:
-                os.unlink(msg_path)
-            except:
-                pass
+            run(["git", "cherry-pick", "--abort"], allow_fail=True)
                 
             log_message(f"Cherry-pick abortado para commit {commit}.", "WARNING")
             end_operation_timer(op_key, "aborted", "user_aborted")
@@ -1930,17 +3447,12 @@ def apply_patch_with_rename_handling(commit):
     # Si no hay conflictos pero el cherry-pick falló por alguna otra razón, intentar con el
     # método de parche
     log_message("Cherry-pick falló sin conflictos detectados. Intentando método alternativo.", "WARNING")
-    run("git cherry-pick --abort", allow_fail=True)
+    run(["git", "cherry-pick", "--abort"], allow_fail=True)
     
     # Para archivos eliminados en HEAD pero modificados en el commit, intentar recrearlos
     # solo si así se ha indicado en la configuración
-    modify_delete_files = []
-    for line in run("git status -s", allow_fail=True).splitlines():
-        if "DU" in line or "UD" in line:  # DU = deleted by us, UD = deleted by them
-            parts = line.split()
-            if len(parts) >= 2:
-                file_path = " ".join(parts[1:])
-                modify_delete_files.append(file_path)
+    # Diccionario como conjunto ordenado: se consulta una vez por renombre
+    modify_delete_files = parse_modify_delete(git_status_snapshot()[1])
     
     for origen, destino in file_renames.items():
         # Ignorar explícitamente archivos marcados como eliminados
@@ -1958,7 +3470,7 @@ def apply_patch_with_rename_handling(commit):
                 
                 # Enlazar o copiar
                 if os.name == 'posix':
-                    run(f"ln -sf {destino} {origen}", allow_fail=True)
+                    run(["ln", "-sf", destino, origen], allow_fail=True)
                 else:
                     import shutil
                     shutil.copy2(destino, origen)
@@ -1966,7 +3478,7 @@ def apply_patch_with_rename_handling(commit):
                 log_message(f"Error al crear enlace: {str(e)}", "ERROR")
     
     # Intentar nuevo cherry-pick con opciones que permitan conflictos y no hagan commit automáticamente
-    cherry_result = run(f"git cherry-pick --no-commit {commit_ref} 2>&1", allow_fail=True)
+    cherry_result = run(["git", "cherry-pick", "--no-commit", commit_ref], allow_fail=True, merge_stderr=True)
     
     # Verificar si hay contenido modificado
     if "nothing to commit" in cherry_result:
@@ -1977,7 +3489,7 @@ def apply_patch_with_rename_handling(commit):
     
     # Verificar si hay archivos con conflictos ahora
     has_conflicts = "CONFLICT" in cherry_result or "error: could not apply" in cherry_result
-    conflicted_files = run("git diff --name-only --diff-filter=U", allow_fail=True).splitlines()
+    conflicted_files = get_unmerged_files()
     
     if has_conflicts and conflicted_files:
         print(Fore.RED + f"error: could not apply {commit[:10]}... {message.splitlines()[0]}")
@@ -2001,39 +3513,20 @@ def apply_patch_with_rename_handling(commit):
                 end_operation_timer(op_key, "failure", "manual_resolution_failed")
                 return False
         else:
-            run("git cherry-pick --abort", allow_fail=True)
+            run(["git", "cherry-pick", "--abort"], allow_fail=True)
             log_message("Resolución de conflictos cancelada por el usuario", "WARNING")
             end_operation_timer(op_key, "cancelled", "user_cancelled")
             return False
     
     # Si no hay conflictos pero hay cambios, hacer commit con el mensaje original
-    result = subprocess.run("git diff --cached --quiet", shell=True)
+    result = subprocess.run(["git", "diff", "--cached", "--quiet"])
     if result.returncode != 0:  # Hay cambios
-        # Obtener mensaje original
-        try:
-            # Crear commit usando el mensaje original
-            with tempfile.NamedTemporaryFile(mode="w+", delete=False) as msg_file:
-                msg_file.write(message)
-                msg_file_path = msg_file.name
-            
-            commit_result = subprocess.run(f"git commit -F {msg_file_path}", shell=True)
-            os.unlink(msg_file_path)
-            
-            if commit_result.returncode != 0:
-                # Fallback con mensaje simple
-                log_message("Error al crear commit con mensaje original. Usando mensaje simple.", "WARNING")
-                subprocess.run(f"git commit -m \"Cherry-pick {commit}\"", shell=True)
-            
-            applied_commits.add(commit)  # Marcar como aplicado
-            log_message(f"Commit {commit} aplicado exitosamente con los renombres.", "SUCCESS")
-            end_operation_timer(op_key, "success", "renamed_success")
-            return True
-        except Exception as e:
-            log_message(f"Error al crear commit: {str(e)}", "ERROR")
-            subprocess.run(f"git commit -m \"Cherry-pick {commit}\"", shell=True)
-            applied_commits.add(commit)  # Marcar como aplicado
-            end_operation_timer(op_key, "success", "renamed_success_fallback")
-            return True
+        # Crear commit usando el mensaje original
+        returncode = git_commit_with_message(message, f"Cherry-pick {commit}")
+        applied_commits.add(commit)  # Marcar como aplicado
+        log_message(f"Commit {commit} aplicado exitosamente con los renombres.", "SUCCESS")
+        end_operation_timer(op_key, "success", "renamed_success" if returncode == 0 else "renamed_success_fallback")
+        return True
     else:
         log_message("No hay cambios para hacer commit después de aplicar los renombres.", "WARNING")
         applied_commits.add(commit)  # Marcar como aplicado
@@ -2042,17 +3535,40 @@ def apply_patch_with_rename_handling(commit):
 
 
 
-def get_preferred_editor():
-
-    if config["default_editor"]:
-        return config["default_editor"]
-
+@functools.lru_cache(maxsize=None)
+def _detect_termux_editor():
+    # Los binarios instalados no cambian durante la ejecución: se comprueban una vez
     if os.path.exists("/data/data/com.termux/files/usr/bin/nvim"):
         return "nvim"
     elif os.path.exists("/data/data/com.termux/files/usr/bin/vim"):
         return "vim"
+    return None
 
-    return os.environ.get("EDITOR", "vi")
+# Editores que abren varios archivos en una misma sesión y esperan a que se
+# cierre, con los argumentos necesarios para ello (en vim, el mensaje y el
+# primer archivo lado a lado y el resto como buffers)
+MULTI_FILE_EDITORS = {
+    "vim": ["-O2"],
+    "nvim": ["-O2"],
+    "nano": [],
+    "micro": [],
+    "emacs": [],
+    "code": ["--wait"],
+    "codium": ["--wait"],
+}
+
+def multi_file_editor_args(editor_cmd):
+    # Argumentos para abrir varios archivos a la vez, o None si el editor no
+    # es uno de los conocidos y hay que abrirlos por separado
+    args = MULTI_FILE_EDITORS.get(os.path.basename(editor_cmd))
+    return list(args) if args is not None else None
+
+def get_preferred_editor():
+
+    if config["default_editor"]:
+        return config["default_editor"]
+
+    return _detect_termux_editor() or os.environ.get("EDITOR", "vi")
 
 def resume_cherry_pick(conflicted_files):
     """
@@ -2060,7 +3576,7 @@ def resume_cherry_pick(conflicted_files):
     Luego continúa el proceso de cherry-pick una vez resueltos los conflictos.
     """
     if not conflicted_files:
-        conflicted_files = run("git diff --name-only --diff-filter=U").splitlines()
+        conflicted_files = get_unmerged_files()
 
     if not conflicted_files:
         log_message("No se encontraron archivos con conflictos.", "WARNING")
@@ -2068,16 +3584,67 @@ def resume_cherry_pick(conflicted_files):
 
     editor_cmd = get_preferred_editor()
 
+    # Cada ronda edita los archivos pendientes; si quedan conflictos se repite
+    # con ellos en lugar de volver a llamar a la función
+    while True:
+        resolved = edit_conflicted_files(conflicted_files, editor_cmd)
+
+        # Las pendientes se deducen de lo que se ha añadido o eliminado en la
+        # ronda; git solo se consulta para confirmar que no queda ninguna
+        remaining = [f for f in conflicted_files if f not in resolved]
+        if not remaining:
+            remaining = get_unmerged_files()
+            if not remaining:
+                break
+
+        print(Fore.YELLOW + f"Todavía quedan {len(remaining)} archivos con conflictos sin resolver:")
+        for file in remaining:
+            print(f" - {file}")
+
+        if auto_mode:
+            log_message("Modo automático: resolviendo archivos restantes", "INFO")
+        else:
+            resolve_rest = input(Fore.CYAN + "¿Quieres resolver estos archivos también? (s/n): ").lower()
+            if not resolve_rest.startswith('s'):
+                log_message("Existen conflictos sin resolver. El cherry-pick no puede continuar.", "WARNING")
+                return False
+        conflicted_files = remaining
+
+    print(Fore.GREEN + "\nTodos los conflictos parecen resueltos.")
+
+    # Añadir cualquier cambio restante
+    if auto_mode:
+        subprocess.run(["git", "add", "."])
+        log_message("Se añadieron todos los archivos automáticamente.", "INFO")
+    else:
+        add_all = input(Fore.CYAN + "¿Deseas hacer 'git add .' para añadir todos los cambios restantes? (s/n): ").lower()
+        if add_all.startswith('s'):
+            subprocess.run(["git", "add", "."])
+
+    # Continuar el cherry-pick
+    print(Fore.GREEN + "Continuando cherry-pick...")
+    result = subprocess.run(["git", "cherry-pick", "--continue"])
+
+    if result.returncode == 0:
+        log_message("Cherry-pick continuado exitosamente.", "SUCCESS")
+        return True
+    else:
+        log_message("Error al continuar cherry-pick.", "ERROR")
+        log_message("Puedes intentar manualmente con:", "INFO")
+        log_message("1. git add <archivos_resueltos>", "INFO")
+        log_message("2. git cherry-pick --continue", "INFO")
+        return False
+
+def edit_conflicted_files(conflicted_files, editor_cmd):
+    # Una ronda de resolución: abre los archivos en el editor, decide los
+    # modify/delete y añade o elimina del índice lo que se haya confirmado.
+    # Las rutas a añadir o eliminar se acumulan y se pasan a git de una vez
+    pending_add = []
+    pending_rm = []
+
     # Comprobar si hay conflictos de tipo modify/delete
-    git_status = run("git status -s", allow_fail=True)
-    modify_delete_files = []
-    
-    for line in git_status.splitlines():
-        if "DU" in line or "UD" in line:  # DU = deleted by us, UD = deleted by them
-            parts = line.split()
-            if len(parts) >= 2:
-                file_path = " ".join(parts[1:])
-                modify_delete_files.append(file_path)
+    # Diccionario como conjunto ordenado: se consulta una vez por archivo en conflicto
+    modify_delete_files = parse_modify_delete(git_status_snapshot()[1])
     
     # Separar archivos normales y modify/delete para tratarlos de forma diferente
     normal_files = [f for f in conflicted_files if f not in modify_delete_files]
@@ -2113,14 +3680,14 @@ def resume_cherry_pick(conflicted_files):
             
             # Preguntar si añadir todos los archivos
             if auto_mode:
+                pending_add.extend(normal_files)
                 for file in normal_files:
-                    subprocess.run(f"git add {file}", shell=True)
                     log_message(f"Archivo '{file}' añadido automáticamente.", "INFO")
             else:
                 add_all = input(Fore.CYAN + "¿Añadir todos los archivos resueltos a git? (s/n): ").lower()
                 if add_all.startswith('s'):
+                    pending_add.extend(normal_files)
                     for file in normal_files:
-                        subprocess.run(f"git add {file}", shell=True)
                         log_message(f"Archivo '{file}' añadido.", "SUCCESS")
         else:
             # Abrir archivos uno a uno
@@ -2133,12 +3700,12 @@ def resume_cherry_pick(conflicted_files):
                 subprocess.run([editor_cmd, file], shell=False)
                 
                 if auto_mode:
-                    subprocess.run(f"git add {file}", shell=True)
+                    pending_add.append(file)
                     log_message(f"Archivo '{file}' añadido automáticamente.", "INFO")
                 else:
                     add_now = input(Fore.CYAN + f"¿Deseas añadir '{file}' con 'git add'? (s/n): ").lower()
                     if add_now.startswith('s'):
-                        subprocess.run(f"git add {file}", shell=True)
+                        pending_add.append(file)
                         log_message(f"Archivo '{file}' añadido correctamente.", "SUCCESS")
     
     # Manejar archivos modify/delete
@@ -2147,24 +3714,23 @@ def resume_cherry_pick(conflicted_files):
         for i, file in enumerate(modify_delete_files, 1):
             print(Fore.CYAN + f"\nArchivo {i}/{len(modify_delete_files)}: {file}")
             
-            # Obtener contenido del archivo desde MERGE_HEAD
-            content = run(f"git show MERGE_HEAD:{file}", allow_fail=True)
+            # Obtener contenido del archivo desde el commit que se está aplicando
+            content = read_picked_file(file)
             if content:
                 print(Fore.CYAN + "Este archivo tiene contenido en el commit que estás aplicando.")
                 
                 if auto_mode:
                     # En modo automático, preferimos recrear el archivo
-                    os.makedirs(os.path.dirname(file), exist_ok=True)
-                    with open(file, "w") as f:
-                        f.write(content)
-                    run(f"git add {file}", allow_fail=True)
+                    write_worktree_file(file, content)
+                    pending_add.append(file)
                     log_message(f"Archivo recreado y añadido automáticamente: {file}", "INFO")
                 else:
                     # Mostrar contenido al usuario
                     print(Fore.CYAN + "Contenido del archivo en el commit (primeras 5 líneas):")
-                    for j, line in enumerate(content.splitlines()[:5]):
+                    preview = content.decode("utf-8", errors="replace").splitlines()
+                    for j, line in enumerate(preview[:5]):
                         print(Fore.WHITE + f"    {line}")
-                    if len(content.splitlines()) > 5:
+                    if len(preview) > 5:
                         print(Fore.WHITE + "    ...")
                     
                     # Preguntar qué hacer
@@ -2178,121 +3744,70 @@ def resume_cherry_pick(conflicted_files):
                     
                     if choice.startswith("Recrear"):
                         # Recrear el archivo
-                        os.makedirs(os.path.dirname(file), exist_ok=True)
-                        with open(file, "w") as f:
-                            f.write(content)
-                        run(f"git add {file}", allow_fail=True)
+                        write_worktree_file(file, content)
+                        pending_add.append(file)
                         log_message(f"Archivo recreado: {file}", "SUCCESS")
                     
                     elif choice.startswith("Abrir"):
                         # Crear archivo y abrirlo en el editor
-                        os.makedirs(os.path.dirname(file), exist_ok=True)
-                        with open(file, "w") as f:
-                            f.write(content)
+                        write_worktree_file(file, content)
                         
                         # Abrir en el editor
                         subprocess.run([editor_cmd, file], shell=False)
                         
                         add_file = input(Fore.CYAN + f"¿Añadir el archivo '{file}' a git? (s/n): ").lower()
                         if add_file.startswith('s'):
-                            run(f"git add {file}", allow_fail=True)
+                            pending_add.append(file)
                             log_message(f"Archivo añadido: {file}", "SUCCESS")
                         else:
-                            run(f"git rm {file}", allow_fail=True)
+                            pending_rm.append(file)
                             log_message(f"Archivo eliminado: {file}", "INFO")
                     
                     elif choice.startswith("Ignorar"):
                         # Mantener el archivo eliminado
-                        run(f"git rm {file}", allow_fail=True)
+                        pending_rm.append(file)
                         log_message(f"Archivo eliminado: {file}", "INFO")
             else:
                 log_message(f"No se pudo obtener contenido para {file}", "WARNING")
-                run(f"git rm {file}", allow_fail=True)
-
-    # Verificar si quedan conflictos sin resolver
-    remaining = run("git diff --name-only --diff-filter=U").splitlines()
-    if remaining:
-        print(Fore.YELLOW + f"Todavía quedan {len(remaining)} archivos con conflictos sin resolver:")
-        for file in remaining:
-            print(f" - {file}")
-
-        if auto_mode:
-            log_message("Modo automático: resolviendo archivos restantes", "INFO")
-            return resume_cherry_pick(remaining)
-        else:
-            resolve_rest = input(Fore.CYAN + "¿Quieres resolver estos archivos también? (s/n): ").lower()
-            if resolve_rest.startswith('s'):
-                return resume_cherry_pick(remaining)
-            else:
-                log_message("Existen conflictos sin resolver. El cherry-pick no puede continuar.", "WARNING")
-                return False
-
-    print(Fore.GREEN + "\nTodos los conflictos parecen resueltos.")
-
-    # Añadir cualquier cambio restante
-    if auto_mode:
-        subprocess.run("git add .", shell=True)
-        log_message("Se añadieron todos los archivos automáticamente.", "INFO")
-    else:
-        add_all = input(Fore.CYAN + "¿Deseas hacer 'git add .' para añadir todos los cambios restantes? (s/n): ").lower()
-        if add_all.startswith('s'):
-            subprocess.run("git add .", shell=True)
+                pending_rm.append(file)
 
-    # Continuar el cherry-pick
-    print(Fore.GREEN + "Continuando cherry-pick...")
-    result = subprocess.run("git cherry-pick --continue", shell=True)
-
-    if result.returncode == 0:
-        log_message("Cherry-pick continuado exitosamente.", "SUCCESS")
-        return True
-    else:
-        log_message("Error al continuar cherry-pick.", "ERROR")
-        log_message("Puedes intentar manualmente con:", "INFO")
-        log_message("1. git add <archivos_resueltos>", "INFO")
-        log_message("2. git cherry-pick --continue", "INFO")
-        return False
+    git_stage_paths(pending_add)
+    git_stage_paths(pending_rm, remove=True)
+    # Rutas resueltas en esta ronda, para que el llamador calcule las
+    # pendientes sin volver a preguntar a git
+    return set(pending_add).union(pending_rm)
 
 def list_history():
     commits = load_history()
-    print(Fore.CYAN + "\nCommits aplicados previamente:")
-    for c in commits:
-        print(Fore.CYAN + f" - {get_commit_context(c)}")
+    prefetch_commit_contexts(commits)
+    # El historial puede ser largo: se escribe en un solo bloque
+    lines = [Fore.CYAN + "\nCommits aplicados previamente:"]
+    lines += [Fore.CYAN + f" - {get_commit_context(c)}" for c in commits]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def get_commit_range(start_commit, end_commit):
-    if remote_name:
-        run(f"git fetch {remote_name}")
-
-    start_ref = start_commit
-    end_ref = end_commit
+    # El remote ya se actualizó en validate_remote y fetch_missing_commits
+    start_ref = resolve_commit_ref(start_commit)
+    end_ref = resolve_commit_ref(end_commit)
 
-    if remote_name:
-        remote_start = f"{remote_name}/{start_commit}"
-        remote_start_exists = run(f"git rev-parse --verify {remote_start}^{{commit}} 2>/dev/null", allow_fail=True)
-        if remote_start_exists:
-            start_ref = remote_start
-
-        remote_end = f"{remote_name}/{end_commit}"
-        remote_end_exists = run(f"git rev-parse --verify {remote_end}^{{commit}} 2>/dev/null", allow_fail=True)
-        if remote_end_exists:
-            end_ref = remote_end
-
-    start_exists = run(f"git rev-parse --verify {start_ref}^{{commit}} 2>/dev/null")
-    if not start_exists:
+    if not commit_exists(start_ref):
         log_message(f"Error: El commit inicial {start_commit} no existe.", "ERROR")
         sys.exit(1)
 
-    end_exists = run(f"git rev-parse --verify {end_ref}^{{commit}} 2>/dev/null")
-    if not end_exists:
+    if not commit_exists(end_ref):
         log_message(f"Error: El commit final {end_commit} no existe.", "ERROR")
         sys.exit(1)
 
-    commits = run(f"git rev-list --reverse {start_ref}^..{end_ref}").splitlines()
+    # Los hashes se leen a medida que llegan en lugar de partir la salida
+    # completa; se consume el primero solo para saber si el rango está vacío
+    commits = iter_log_hashes("--reverse", f"{start_ref}^..{end_ref}")
+    first = next(commits, None)
 
-    if not commits:
+    if first is None:
         log_message("No se encontraron commits en el rango especificado.", "ERROR")
         sys.exit(1)
 
-    return commits
+    return itertools.chain([first], commits)
 
 def show_help():
     print("Smart Cherry Pick - Herramienta para aplicar commits de manera inteligente")
@@ -2315,6 +3830,7 @@ def show_help():
     print("  --apply-saved          Aplica los commits guardados previamente")
     print("  --config KEY=VALUE     Establece opciones de configuración")
     print("  --no-stats             Desactiva el registro de estadísticas")
+    print("  --force-fetch          Actualiza el remote aunque se haya traído hace poco")
     print("  --help                 Muestra este mensaje de ayuda")
     print("\nConfiguración:")
     print("  max_commits_display    Número máximo de commits a mostrar en listas")
@@ -2325,6 +3841,7 @@ def show_help():
     print("  max_retries            Número máximo de reintentos para comandos fallidos")
     print("  retry_delay            Retraso en segundos entre reintentos")
     print("  record_stats           Registrar estadísticas en CSV (true/false)")
+    print("  fetch_ttl              Segundos durante los que no se repite el fetch del remote")
     print("\nEjemplos:")
     print("  python3 smart-chery-pick.py abc1234")
     print("  python3 smart-chery-pick.py abc1234 def5678 --remote origin")
@@ -2333,9 +3850,28 @@ def show_help():
     print("  python3 smart-chery-pick.py --auto --range-commits abc1234 def5678")
     print("  python3 smart-chery-pick.py --config max_search_depth=50 auto_add_dependencies=true")
 
+def ensure_commit_graph():
+    # Los `git log -- <ruta>` del análisis son mucho más rápidos con un
+    # commit-graph con filtros de Bloom por ruta; se escribe una sola vez si el
+    # repositorio no tiene ninguno
+    if not config["write_commit_graph"]:
+        return
+    info_dir = run(["git", "rev-parse", "--git-path", "objects/info"], allow_fail=True)
+    if not info_dir:
+        return
+    if os.path.exists(os.path.join(info_dir, "commit-graph")) or os.path.isdir(os.path.join(info_dir, "commit-graphs")):
+        return
+    log_message("Generando commit-graph para acelerar las consultas al historial", "INFO")
+    run(["git", "commit-graph", "write", "--reachable", "--changed-paths"], allow_fail=True)
+
+@functools.lru_cache(maxsize=1)
+def git_remotes():
+    # main y validate_remote consultan la misma lista; se vacía tras `git remote add`
+    return tuple(run(["git", "remote"]).splitlines())
+
 def validate_remote(remote):
     """Valida y actualiza la información de un remote Git."""
-    remotes = run("git remote").splitlines()
+    remotes = git_remotes()
     if remote not in remotes:
         print(Fore.RED + f"Error: El remote '{remote}' no existe.")
         print(Fore.YELLOW + "Remotes disponibles:")
@@ -2345,11 +3881,20 @@ def validate_remote(remote):
         log_message(f"El remote '{remote}' no existe. Usa uno de los remotos existentes.", "ERROR")
         sys.exit(1)
 
-    remote_url = run(f"git remote get-url {remote}")
+    remote_url = run(["git", "remote", "get-url", remote])
     log_message(f"Usando remote '{remote}' ({remote_url})", "INFO")
 
+    # Si otra ejecución reciente ya actualizó el remote no se vuelve a traer
+    # (salvo con --force-fetch)
+    with _fetch_lock:
+        age = remote_fetch_age(remote)
+    if not force_fetch and age is not None and age < config["fetch_ttl"]:
+        log_message(f"El remote '{remote}' se actualizó hace {int(age)} segundos; se omite el fetch.", "INFO")
+        return True
+
     print(Fore.CYAN + f"Actualizando información del remote '{remote}'...")
-    run(f"git fetch {remote}", capture_output=False)
+    if not ensure_remote_fetched(remote, capture_output=False, allow_fail=False, force=True):
+        log_message(f"No se pudo actualizar el remote '{remote}'; se usan las referencias locales.", "WARNING")
     return True
 
 def update_config_from_args(config_args):
@@ -2357,26 +3902,22 @@ def update_config_from_args(config_args):
     for arg in config_args:
         if "=" in arg:
             key, value = arg.split("=", 1)
-            if key in config:
-
-                if isinstance(config[key], bool):
-                    config[key] = value.lower() in ["true", "yes", "1", "t", "y"]
-                elif isinstance(config[key], int):
-                    config[key] = int(value)
-                elif isinstance(config[key], float):
-                    config[key] = float(value)
-                else:
-                    config[key] = value
-                log_message(f"Configuración actualizada: {key}={value}", "INFO")
-            else:
+            parse = CONFIG_PARSERS.get(key)
+            if parse is None:
                 log_message(f"Configuración desconocida: {key}", "WARNING")
+                continue
+            try:
+                config[key] = parse(value)
+            except ValueError:
+                log_message(f"Valor inválido para {key}: {value}", "WARNING")
+                continue
+            log_message(f"Configuración actualizada: {key}={value}", "INFO")
     save_config()
 
-def main():
-    global applied_commits, stop_analysis, cherry_pick_queue, final_commits, analyzed_commits
-    global initial_commit, initial_commits, author_map, skipped_commits, remote_name, auto_mode
-    global verbose_mode, dry_run, file_renames
-
+@functools.lru_cache(maxsize=None)
+def build_arg_parser():
+    # El parser es siempre el mismo: se construye una vez aunque main() se
+    # llame varias veces desde otro script
     parser = argparse.ArgumentParser(description='Smart Cherry Pick - Herramienta para aplicar commits de manera inteligente', add_help=False)
     parser.add_argument('commits', nargs='*', help='Commits a aplicar')
     parser.add_argument('--range-commits', nargs=2, metavar=('START_COMMIT', 'END_COMMIT'), help='Especifica un rango de commits para aplicar')
@@ -2389,13 +3930,27 @@ def main():
     parser.add_argument('--config', nargs='+', metavar='KEY=VALUE', help='Establece opciones de configuración')
     parser.add_argument('--help', action='store_true', help='Muestra este mensaje de ayuda')
     parser.add_argument('--no-stats', action='store_true', help='No registrar estadísticas')
+    parser.add_argument('--force-fetch', action='store_true', help='Actualiza el remote aunque se haya traído hace poco')
+    return parser
 
+def main():
+    global applied_commits, stop_analysis, cherry_pick_queue, final_commits, pending_commits, analyzed_commits
+    global initial_commit, initial_commits, author_map, skipped_commits, remote_name, auto_mode
+    global verbose_mode, dry_run, force_fetch, file_renames, adding_commit_cache, blame_cache, commit_files_cache
+
+    # parse_known_args devuelve las opciones desconocidas en lugar de salir con
+    # SystemExit; la excepción solo queda para valores mal formados
     try:
-        args = parser.parse_args()
+        args, unknown = build_arg_parser().parse_known_args()
     except SystemExit:
         show_help()
         return
 
+    if unknown:
+        print(Fore.RED + f"Argumentos desconocidos: {' '.join(unknown)}")
+        show_help()
+        return
+
     if args.help or (not args.commits and not args.range_commits and not args.apply_saved):
         show_help()
         return
@@ -2417,11 +3972,12 @@ def main():
     # Configuración de estadísticas
     if args.no_stats:
         config["record_stats"] = False
+    if args.force_fetch:
+        force_fetch = True
     
-    # Inicialización de archivos
-    if not os.path.exists(LOG_FILE):
-        open(LOG_FILE, "w").close()
-    
+    # El archivo de log no se crea aquí: el FileHandler lo abre en modo "a"
+    # (que lo crea si no existe) con el primer mensaje, justo debajo
+
     # Inicializar estadísticas si están habilitadas
     if config["record_stats"]:
         init_stats_file()
@@ -2432,14 +3988,14 @@ def main():
         remote_name = args.remote
         log_message(f"Usando remote '{remote_name}' para buscar commits y archivos.", "INFO")
         # Validar si el remote existe, y si no, preguntar si desea crearlo
-        remotes = run("git remote").splitlines()
-        if remote_name not in remotes:
+        if remote_name not in git_remotes():
             print(Fore.YELLOW + f"El remote '{remote_name}' no existe.")
             if not auto_mode:
                 create_remote = input(Fore.CYAN + f"¿Deseas agregar el remote '{remote_name}'? (URL del repositorio o 'n' para cancelar): ").strip()
                 if create_remote.lower() != 'n' and create_remote:
                     try:
-                        run(f"git remote add {remote_name} {create_remote}", capture_output=False)
+                        run(["git", "remote", "add", remote_name, create_remote], capture_output=False)
+                        git_remotes.cache_clear()
                         log_message(f"Remote '{remote_name}' agregado con URL {create_remote}", "SUCCESS")
                         validate_remote(remote_name)
                     except Exception as e:
@@ -2454,10 +4010,9 @@ def main():
         else:
             validate_remote(remote_name)
 
-    author_map = load_author_map()
+    ensure_commit_graph()
+
     applied_commits = load_history()
-    dep_cache = load_dep_cache()
-    file_renames = load_file_renames()
 
     if args.apply_saved:
         saved_commits = load_commits_list()
@@ -2467,6 +4022,7 @@ def main():
 
         log_message(f"Aplicando {len(saved_commits)} commits guardados.", "INFO")
         initial_commits = saved_commits
+        fetch_missing_commits(initial_commits)
 
     elif args.range_commits:
         start_commit, end_commit = args.range_commits
@@ -2476,17 +4032,22 @@ def main():
             log_message(f"Se omitirán {len(skipped_commits)} commits: {', '.join(list(skipped_commits)[:3])}...", "INFO")
 
         log_message(f"Obteniendo commits desde {start_commit} hasta {end_commit}...", "INFO")
-        commit_range = get_commit_range(start_commit, end_commit)
-
-        initial_commits = [c for c in commit_range if c not in skipped_commits]
-
-        log_message(f"Se encontraron {len(commit_range)} commits en el rango, {len(initial_commits)} después de filtrar.", "INFO")
+        fetch_missing_commits([start_commit, end_commit])
+        range_size = 0
+        initial_commits = []
+        for c in get_commit_range(start_commit, end_commit):
+            range_size += 1
+            if c not in skipped_commits:
+                initial_commits.append(c)
+
+        log_message(f"Se encontraron {range_size} commits en el rango, {len(initial_commits)} después de filtrar.", "INFO")
         print(Fore.CYAN + "Commits a aplicar (primeros 5):")
-        for i, c in enumerate(initial_commits[:5], 1):
-            print(Fore.CYAN + f"  {i}. {get_commit_context(c)}")
-
+        prefetch_commit_contexts(initial_commits[:5])
+        preview = [Fore.CYAN + f"  {i}. {get_commit_context(c)}" for i, c in enumerate(initial_commits[:5], 1)]
         if len(initial_commits) > 5:
-            print(Fore.CYAN + f"     ... y {len(initial_commits)-5} más.")
+            preview.append(Fore.CYAN + f"     ... y {len(initial_commits)-5} más.")
+        if preview:
+            sys.stdout.write("\n".join(preview) + "\n")
 
     else:
         if not args.commits:
@@ -2495,53 +4056,77 @@ def main():
             return
 
         initial_commits = args.commits
+        fetch_missing_commits(initial_commits)
         log_message(f"Se aplicarán {len(initial_commits)} commits especificados.", "INFO")
 
     save_commits_list(initial_commits)
 
     stop_analysis = False
-    cherry_pick_queue = []
-    final_commits = []
+    cherry_pick_queue = {}
+    final_commits = {}
+    pending_commits = set()
     analyzed_commits = set()
 
     # Procesar cada commit
     total_start_time = time.time()
-    try:
-        for commit in initial_commits:
-            if commit in applied_commits:
-                log_message(f"El commit {commit} ya fue aplicado anteriormente. Saltando.", "INFO")
-                continue
+    # Los commits ya aplicados u omitidos se descartan antes del bucle (ambos
+    # son conjuntos), y así la precarga tampoco trabaja con ellos. Un commit
+    # repetido en la lista se procesa una sola vez
+    unique_commits = list(dict.fromkeys(initial_commits))
+    already_applied = sum(1 for c in unique_commits if c in applied_commits)
+    commits_to_process = [c for c in unique_commits if c not in applied_commits and c not in skipped_commits]
+    # Un solo mensaje con el resumen en lugar de una línea por commit saltado
+    skipped_count = len(unique_commits) - len(commits_to_process) - already_applied
+    if already_applied or skipped_count:
+        log_message(f"Saltando {already_applied} commits ya aplicados y {skipped_count} en la lista de commits a omitir.", "INFO")
+
+    # En una nueva ejecución sobre commits ya aplicados no hay nada que hacer:
+    # se sale sin leer las cachés del análisis
+    if not commits_to_process:
+        log_message("Todos los commits indicados ya fueron aplicados u omitidos. No hay nada que hacer.", "SUCCESS")
+        print(Fore.GREEN + "\nTodos los commits indicados ya fueron aplicados u omitidos. No hay nada que hacer.")
+        return
 
-            if commit in skipped_commits:
-                log_message(f"El commit {commit} está en la lista de commits a omitir. Saltando.", "INFO")
-                continue
+    author_map = load_author_map()
+    adding_commit_cache = load_adding_commit_cache()
+    blame_cache = load_blame_cache()
+    commit_files_cache = load_commit_files_cache()
+    dep_cache = load_dep_cache()
+    file_renames = load_file_renames()
 
+    prefetch_finished = threading.Event()
+    interrupted = False
+    prefetch_executor = start_commit_prefetch(commits_to_process, dep_cache, prefetch_finished)
+    try:
+        for commit in commits_to_process:
             initial_commit = commit
             stop_analysis = False
-            cherry_pick_queue = [commit]
+            cherry_pick_queue = {commit: None}
+            pending_commits.add(commit)
 
             process_commit(commit, dep_cache)
 
-        if final_commits and not all(c in applied_commits for c in final_commits):
+        if any(c not in applied_commits for c in final_commits):
             ask_to_proceed()
 
     except KeyboardInterrupt:
         print(Fore.RED + "\nOperación interrumpida por el usuario.")
-        # Guardar el progreso actual
-        save_history(applied_commits)
-        save_dep_cache(dep_cache)
-        save_author_map(author_map)
-        print(Fore.YELLOW + "Se ha guardado el progreso. Puedes retomar más tarde con --apply-saved.")
-        sys.exit(1)
+        interrupted = True
     finally:
-        # Guardar estado final
-        save_history(applied_commits)
-        save_dep_cache(dep_cache)
-        save_author_map(author_map)
+        # La precarga también escribe en dep_cache: se detiene antes de guardarla.
+        # El estado se guarda una sola vez, también tras una interrupción
+        prefetch_finished.set()
+        prefetch_executor.shutdown(wait=True, cancel_futures=True)
+        save_state(dep_cache)
+        if interrupted:
+            print(Fore.YELLOW + "Se ha guardado el progreso. Puedes retomar más tarde con --apply-saved.")
 
         elapsed_time = int(time.time() - start_time)
         log_message(f"Proceso completado en {elapsed_time} segundos.", "SUCCESS")
         print(Fore.GREEN + f"\nProceso completado en {elapsed_time} segundos.")
 
+    if interrupted:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
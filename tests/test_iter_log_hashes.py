@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import subprocess
+import tempfile
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "smart-chery-pick.py")
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("smart_cherry_pick", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipUnless(importlib.util.find_spec("colorama"), "colorama no está instalado")
+class IterLogHashesTest(unittest.TestCase):
+    # iter_log_hashes es un generador: cada llamada tiene que lanzar su propio
+    # `git log`, aunque los argumentos se repitan
+
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+        subprocess.run(["git", "init", "-q"], check=True)
+        for content in ("uno\n", "dos\n"):
+            with open("f", "w") as f:
+                f.write(content)
+            subprocess.run(["git", "add", "f"], check=True)
+            subprocess.run(git + ["commit", "-q", "-m", content.strip()], check=True)
+        self.scp = load_script()
+
+    def tearDown(self):
+        self.scp.close_all_cat_files()
+        os.chdir(self.old_cwd)
+        self.tmp.cleanup()
+
+    def test_last_log_hash_repeated(self):
+        first = self.scp.last_log_hash("--", "f")
+        self.assertIsNotNone(first)
+        self.assertEqual(self.scp.last_log_hash("--", "f"), first)
+
+    def test_iter_log_hashes_repeated(self):
+        hashes = list(self.scp.iter_log_hashes("--", "f"))
+        self.assertEqual(len(hashes), 2)
+        self.assertEqual(list(self.scp.iter_log_hashes("--", "f")), hashes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import subprocess
+import tempfile
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "smart-chery-pick.py")
+GIT = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("smart_cherry_pick", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git(*args):
+    return subprocess.run(GIT + list(args), check=True, capture_output=True, text=True).stdout.strip()
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@unittest.skipUnless(importlib.util.find_spec("colorama"), "colorama no está instalado")
+class PrecomputeLastCommitsTest(unittest.TestCase):
+    # El `git log` conjunto tiene que dar el mismo commit que `git log -n 1 --
+    # archivo` para cada archivo, también cuando hay merges de por medio
+
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        git("init", "-q", "-b", "main")
+        write("a", "1\n")
+        write("b", "1\n")
+        git("add", "a", "b")
+        git("commit", "-q", "-m", "base")
+        self.scp = load_script()
+
+    def tearDown(self):
+        self.scp.close_all_cat_files()
+        os.chdir(self.old_cwd)
+        self.tmp.cleanup()
+
+    def expected(self, path):
+        return git("log", "-n", "1", "--pretty=format:%H", "--", path)
+
+    def test_linear_history(self):
+        write("a", "2\n")
+        git("commit", "-q", "-am", "a")
+        self.scp.precompute_last_commits(["a", "b", "c"])
+        cache = self.scp._last_commit_cache
+        self.assertEqual(cache["a"], self.expected("a"))
+        self.assertEqual(cache["b"], self.expected("b"))
+        self.assertEqual(cache["c"], "")
+
+    def test_merge_keeping_one_side(self):
+        # X cambia a y b en una rama; el merge conserva la a de main y toma
+        # la b de la rama, así que `git log -- a` no recorre la rama
+        git("checkout", "-q", "-b", "side")
+        write("a", "2\n")
+        write("b", "2\n")
+        git("commit", "-q", "-am", "X")
+        git("checkout", "-q", "main")
+        write("c", "1\n")
+        git("add", "c")
+        git("commit", "-q", "-m", "C")
+        git("merge", "-q", "--no-commit", "side")
+        git("checkout", "HEAD", "--", "a")
+        git("commit", "-q", "-m", "M")
+        self.scp.precompute_last_commits(["a", "b"])
+        for path in ("a", "b"):
+            self.assertEqual(self.scp.get_last_commit_affecting_file(path), self.expected(path))
+
+
+if __name__ == "__main__":
+    unittest.main()